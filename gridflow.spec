@@ -42,6 +42,7 @@ hiddenimports = [
     'shapely.prepared',
     'argparse',
     'fiona',  # Ensure fiona is included
+    'h5py',  # Optional import: raw chunk copy in crop, fast attribute reads in catalog
 ]
 hiddenimports += collect_submodules('fiona')
 hiddenimports += collect_submodules('geopandas', filter=lambda name: not name.startswith('geopandas.tests'))
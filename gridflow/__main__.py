@@ -320,6 +320,19 @@ def main():
         default=min(os.cpu_count() or 4, 4),
         help="Number of parallel workers"
     )
+    crop_parser.add_argument(
+        '--compression',
+        choices=['zlib', 'zstd', 'none'],
+        default='zlib',
+        help="Output compression codec (zstd needs the HDF5 zstd filter to read back)"
+    )
+    crop_parser.add_argument(
+        '--complevel',
+        type=int,
+        choices=range(1, 10),
+        metavar='{1-9}',
+        help="Compression level (default: 4 for zlib, 3 for zstd; 1 is much faster for a slightly larger file)"
+    )
     crop_parser.add_argument(
         '--demo',
         action='store_true',
@@ -13,17 +13,64 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
+import itertools
 import json
 import logging
 import os
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from threading import Lock
 import netCDF4
+import numpy as np
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib encoder
+    orjson = None
+
+try:
+    import h5py
+except ImportError:  # h5py is optional; without it every file is opened through netCDF4
+    h5py = None
 
 # Suppress HDF5 error messages
 os.environ["HDF5_LOG_LEVEL"] = "0"
 
+# Global attributes that identify a file in the catalog
+METADATA_KEYS = ("activity_id", "source_id", "variant_label", "variable_id", "institution_id")
+# Fields a file must carry to be cataloged
+REQUIRED_KEYS = ("activity_id", "source_id", "variant_label", "variable_id")
+
+# Per-file metadata from earlier runs, kept next to the catalog
+METADATA_CACHE_FILENAME = ".metadata_cache.json"
+
+# netcdf-c is not thread-safe, so fallback opens through netCDF4 run one at a time;
+# h5py reads need no lock here because h5py serializes HDF5 calls itself
+_netcdf_lock = Lock()
+
+def _read_global_attrs_hdf5(file_path: Path) -> Optional[Dict[str, str]]:
+    """Read METADATA_KEYS straight from the HDF5 root group, or return None if that is not possible.
+
+    netCDF4.Dataset builds a wrapper for every dimension and variable on open; h5py opens lazily
+    and touches only the root attributes. Classic (NetCDF3) files are not HDF5 and return None.
+    """
+    if h5py is None:
+        return None
+    try:
+        with h5py.File(file_path, 'r') as f:
+            attrs = f.attrs
+            metadata = {}
+            for key in METADATA_KEYS:
+                value = attrs.get(key, "")
+                # Unwrap like netCDF4: variable-length strings arrive as one-element object arrays
+                if isinstance(value, np.ndarray) and value.size == 1:
+                    value = value.item()
+                metadata[key] = value.decode('utf-8', 'replace') if isinstance(value, bytes) else value
+            return metadata
+    except OSError:
+        return None
+
 def extract_metadata(file_path: str) -> Dict[str, str]:
     """Extract metadata from a NetCDF file.
 
@@ -38,18 +85,50 @@ def extract_metadata(file_path: str) -> Dict[str, str]:
         return {"file_path": str(file_path), "metadata": {}, "error": f"File {file_path} does not exist"}
 
     try:
-        with netCDF4.Dataset(file_path, 'r') as ds:
-            metadata = {
-                "activity_id": getattr(ds, "activity_id", ""),
-                "source_id": getattr(ds, "source_id", ""),
-                "variant_label": getattr(ds, "variant_label", ""),
-                "variable_id": getattr(ds, "variable_id", ""),
-                "institution_id": getattr(ds, "institution_id", "")
-            }
+        metadata = _read_global_attrs_hdf5(file_path)
+        if metadata is None:
+            with _netcdf_lock, netCDF4.Dataset(file_path, 'r') as ds:
+                metadata = {key: getattr(ds, key, "") for key in METADATA_KEYS}
         return {"file_path": str(file_path), "metadata": metadata, "error": None}
     except Exception as e:
         return {"file_path": str(file_path), "metadata": {}, "error": f"Failed to extract metadata: {repr(e)}"}
 
+def load_metadata_cache(cache_file: Path) -> Dict[str, Dict]:
+    """Load the per-file metadata cache written by a previous run, or an empty cache.
+
+    Args:
+        cache_file (Path): Path to the cache JSON file.
+
+    Returns:
+        Dict[str, Dict]: Mapping of file path to {"mtime": ns, "size": bytes, "meta": metadata}.
+    """
+    try:
+        data = cache_file.read_bytes()
+        cache = orjson.loads(data) if orjson is not None else json.loads(data)
+        return cache if isinstance(cache, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+def write_json(obj, path: Path) -> None:
+    """Write *obj* to *path* as indented JSON in a single write, using orjson when available."""
+    if orjson is not None:
+        data = orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+    else:
+        data = json.dumps(obj, indent=2).encode('utf-8')
+    with open(path, 'wb') as f:
+        f.write(data)
+
+def extract_metadata_batch(file_paths: List[str]) -> List[Dict[str, str]]:
+    """Extract metadata for several NetCDF files in one task.
+
+    Args:
+        file_paths (List[str]): Paths to the NetCDF files.
+
+    Returns:
+        List[Dict[str, str]]: One extract_metadata result per path, in the same order.
+    """
+    return [extract_metadata(file_path) for file_path in file_paths]
+
 def is_non_prefixed_filename(filename: str) -> bool:
     """Determine if a filename is non-prefixed (starts with a CMIP variable).
 
@@ -119,6 +198,7 @@ def generate_catalog(
 
     output_file = output_dir / filename
     duplicates_file = output_dir / duplicates_filename
+    cache_file = output_dir / METADATA_CACHE_FILENAME
 
     # Recursively find all *.nc files
     nc_files = list(input_dir.rglob("*.nc"))
@@ -170,50 +250,86 @@ def generate_catalog(
     skipped_count = 0
     included_count = 0
 
-    logging.info(f"Processing {total_files} unique NetCDF files with {workers} workers")
+    # Files whose path, mtime and size match the cache from a previous run reuse its metadata
+    cache = load_metadata_cache(cache_file)
+    file_stats = {}
+    cached_results = []
+    to_extract = []
+    for nc_file in unique_files:
+        file_path = str(nc_file)
+        try:
+            st = nc_file.stat()
+        except OSError:
+            to_extract.append(file_path)
+            continue
+        file_stats[file_path] = (st.st_mtime_ns, st.st_size)
+        entry = cache.get(file_path)
+        if entry and entry.get("mtime") == st.st_mtime_ns and entry.get("size") == st.st_size:
+            cached_results.append({"file_path": file_path, "metadata": entry["meta"], "error": None})
+        else:
+            to_extract.append(file_path)
+
+    logging.info(f"Processing {total_files} unique NetCDF files with {workers} workers "
+                 f"({len(cached_results)} unchanged since the last run)")
 
-    with ThreadPoolExecutor(max_workers=workers) as executor:
-        future_to_file = {executor.submit(extract_metadata, str(nc_file)): nc_file for nc_file in unique_files}
-        for future in as_completed(future_to_file):
+    # Attribute reads take well under a millisecond each, so threads beat worker processes, whose
+    # startup (notably spawn on Windows) costs more than a whole catalog; batching several files
+    # per task keeps future bookkeeping small next to the reads
+    batch_size = max(8, len(to_extract) // (workers * 4))
+    batches = [to_extract[i:i + batch_size] for i in range(0, len(to_extract), batch_size)]
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(batches)))) as executor:
+        futures = [executor.submit(extract_metadata_batch, batch) for batch in batches]
+        completed = itertools.chain([cached_results], (future.result() for future in as_completed(futures)))
+        for batch_results in completed:
             if stop_flag and stop_flag():
                 logging.info("Catalog generation stopped by user")
-                executor._threads.clear()  # Clear threads to allow shutdown
-                executor.shutdown(wait=False, cancel_futures=True)
+                executor.shutdown(wait=True, cancel_futures=True)
                 return catalog
-            processed_count += 1
-            result = future.result()
-            file_path = result["file_path"]
-            metadata = result["metadata"]
-            error = result.get("error")
-            if error:
-                logging.error(error)
-                skipped_count += 1
-                continue
-            if not metadata or not all(metadata.get(k) for k in ["activity_id", "source_id", "variant_label", "variable_id"]):
-                missing_fields = [k for k in ["activity_id", "source_id", "variant_label", "variable_id"] if not metadata.get(k)]
-                logging.warning(f"Skipping {file_path}: Incomplete metadata (missing: {', '.join(missing_fields)})")
-                skipped_count += 1
-                continue
-
-            key = f"{metadata['activity_id']}:{metadata['source_id']}:{metadata['variant_label']}"
-            if key not in catalog:
-                catalog[key] = {
-                    "activity_id": metadata["activity_id"],
-                    "source_id": metadata["source_id"],
-                    "variant_label": metadata["variant_label"],
-                    "institution_id": metadata["institution_id"],
-                    "variables": {}
-                }
-            variable_id = metadata["variable_id"]
-            if variable_id not in catalog[key]["variables"]:
-                catalog[key]["variables"][variable_id] = {
-                    "file_count": 0,
-                    "files": []
-                }
-            catalog[key]["variables"][variable_id]["files"].append({"path": file_path})
-            catalog[key]["variables"][variable_id]["file_count"] += 1
-            included_count += 1
-            logging.info(f"Progress: {processed_count}/{total_files} files")
+            for result in batch_results:
+                processed_count += 1
+                file_path = result["file_path"]
+                metadata = result["metadata"]
+                error = result.get("error")
+                if not error and file_path in file_stats:
+                    mtime, size = file_stats[file_path]
+                    cache[file_path] = {"mtime": mtime, "size": size, "meta": metadata}
+                if error:
+                    logging.error(error)
+                    skipped_count += 1
+                    continue
+                missing_fields = [k for k in REQUIRED_KEYS if not metadata.get(k)]
+                if missing_fields:
+                    logging.warning(f"Skipping {file_path}: Incomplete metadata (missing: {', '.join(missing_fields)})")
+                    skipped_count += 1
+                    continue
+                # Read the identifying fields into locals once; they key and fill the entry
+                activity_id = metadata["activity_id"]
+                source_id = metadata["source_id"]
+                variant_label = metadata["variant_label"]
+                variable_id = metadata["variable_id"]
+
+                key = f"{activity_id}:{source_id}:{variant_label}"
+                # One probe per level: fetch the group and variable entries once and keep the references
+                group = catalog.get(key)
+                if group is None:
+                    group = catalog[key] = {
+                        "activity_id": activity_id,
+                        "source_id": source_id,
+                        "variant_label": variant_label,
+                        "institution_id": metadata["institution_id"],
+                        "variables": {}
+                    }
+                variables = group["variables"]
+                entry = variables.get(variable_id)
+                if entry is None:
+                    entry = variables[variable_id] = {
+                        "file_count": 0,
+                        "files": []
+                    }
+                entry["files"].append({"path": file_path})
+                entry["file_count"] += 1
+                included_count += 1
+                logging.info(f"Progress: {processed_count}/{total_files} files")
 
     if demo_mode and included_count == 0:
         logging.critical(f"No valid NetCDF files with complete metadata found in {input_dir}. Run 'gridflow download --demo' to generate sample files.")
@@ -223,10 +339,15 @@ def generate_catalog(
     logging.info(f"Summary: Processed {processed_count} files, Included {included_count} files, "
                  f"Skipped {skipped_count} files ({len(duplicates)} duplicates, {skipped_count - len(duplicates)} errors/incomplete)")
 
+    # Persist the metadata cache, dropping files that no longer exist
+    try:
+        write_json({path: entry for path, entry in cache.items() if path in file_stats or os.path.exists(path)}, cache_file)
+    except Exception as e:
+        logging.warning(f"Failed to save metadata cache to {cache_file}: {str(e)}")
+
     # Save main catalog
     try:
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(catalog, f, indent=2)
+        write_json(catalog, output_file)
         logging.info(f"Catalog saved to {output_file}")
     except Exception as e:
         logging.error(f"Failed to save catalog to {output_file}: {str(e)}")
@@ -235,8 +356,7 @@ def generate_catalog(
     # Save duplicates JSON
     if duplicates:
         try:
-            with open(duplicates_file, 'w', encoding='utf-8') as f:
-                json.dump(duplicates, f, indent=2)
+            write_json(duplicates, duplicates_file)
             logging.info(f"Duplicate files saved to {duplicates_file}")
         except Exception as e:
             logging.error(f"Failed to save duplicates to {duplicates_file}: {str(e)}")
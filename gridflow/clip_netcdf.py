@@ -5,8 +5,11 @@ import netCDF4 as nc
 import geopandas as gpd
 from pathlib import Path
 from threading import Lock
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from logging.handlers import QueueHandler, QueueListener
+import multiprocessing
 import os
+import signal
 from shapely.vectorized import contains
 from shapely.prepared import prep
 from typing import Union, Optional
@@ -58,6 +61,8 @@ def clip_single_file(
             return False
 
         with nc.Dataset(str(input_file), "r") as src:
+            # Copy stored values as-is: no unpack/unmask on read, no re-pack/re-fill on write
+            src.set_auto_maskandscale(False)
             lat = src.variables["lat"][:]  # 1-D
             lon = src.variables["lon"][:]
             if lon.max() > 180:
@@ -70,24 +75,24 @@ def clip_single_file(
                     dst.createDimension(dname, len(dim) if not dim.isunlimited() else None)
 
                 for vname, varin in src.variables.items():
-                    fill_kw = {}
-                    if "_FillValue" in varin.ncattrs():
-                        fill_kw["fill_value"] = varin.getncattr("_FillValue")
+                    # __dict__ is a fresh copy of the attributes, read once per variable
+                    attrs = varin.__dict__
+                    fill_value = attrs.pop("_FillValue", None)
 
                     out = dst.createVariable(
                         vname, varin.datatype, varin.dimensions,
-                        zlib=True, complevel=5, **fill_kw
+                        zlib=True, complevel=5, fill_value=fill_value
                     )
-                    out.setncatts({k: varin.getncattr(k)
-                                  for k in varin.ncattrs() if k != "_FillValue"})
+                    out.set_auto_maskandscale(False)
+                    out.setncatts(attrs)
 
                     data = varin[:]
                     if ("lat" in varin.dimensions) and ("lon" in varin.dimensions):
-                        fill_val = fill_kw.get("fill_value", np.nan)
+                        fill_val = np.nan if fill_value is None else fill_value
                         data = np.where(mask2d, data, fill_val)
                     out[:] = data
 
-                dst.setncatts({k: src.getncattr(k) for k in src.ncattrs()})
+                dst.setncatts(src.__dict__)
 
         with logging_lock:
             logging.info(f"Clipped file created: {output_file}")
@@ -98,6 +103,26 @@ def clip_single_file(
             logging.error(f"Failed to clip {input_file.name}: {e}")
         return False
 
+# Set in each clip worker process by _init_clip_worker
+_worker_stop_event = None
+_worker_prep_geom = None
+
+def _init_clip_worker(geom, stop_event, log_queue, log_level: int) -> None:
+    """Prepare the clip geometry once per worker, forward its log records to the parent and share the parent's stop event."""
+    global _worker_stop_event, _worker_prep_geom
+    # Ctrl-C reaches the whole process group; only the parent reacts, and stops workers via the event
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _worker_stop_event = stop_event
+    # Prepared geometries do not pickle, so each worker prepares its own copy
+    _worker_prep_geom = prep(geom)
+    root = logging.getLogger()
+    root.handlers = [QueueHandler(log_queue)]
+    root.setLevel(log_level)
+
+def _clip_in_worker(input_file: Path, output_file: Path) -> bool:
+    """Run clip_single_file in a worker process, stopping when the parent sets the stop event."""
+    return clip_single_file(input_file, _worker_prep_geom, output_file, _worker_stop_event.is_set)
+
 def clip_netcdf(
     input_dir: str,
     shapefile_path: str,
@@ -163,7 +188,7 @@ def clip_netcdf(
         gdf_raw = gpd.read_file(shapefile_path)
         gdf_buf = add_buffer(gdf_raw, buffer_km=buffer_km)
         gdf_buf = gdf_buf.to_crs("EPSG:4326")
-        prep_geom = prep(gdf_buf.unary_union)
+        geom = gdf_buf.unary_union
 
         # Gather NetCDF files
         nc_files = sorted(input_dir.glob("*.nc"))
@@ -174,46 +199,56 @@ def clip_netcdf(
 
         out_paths = [output_dir / f"{p.stem}_clipped{p.suffix}" for p in nc_files]
 
-        # Threaded clipping
+        # netcdf-c is not thread-safe, so files are clipped in worker processes rather than threads.
+        # Workers log through a queue drained by the parent's handlers and watch a shared stop event.
         workers = workers or (os.cpu_count() or 4)
         progress_int = max(1, len(nc_files) // 10)
         next_mark = progress_int
         completed = success = 0
 
-        with ThreadPoolExecutor(max_workers=workers) as ex:
-            future_to_nc = {
-                ex.submit(
-                    clip_single_file,
-                    nc_path,
-                    prep_geom,
-                    out_path,
-                    stop_flag
-                ): (nc_path, out_path)
-                for nc_path, out_path in zip(nc_files, out_paths)
-            }
-
-            for fut in as_completed(future_to_nc):
-                if stop_flag and stop_flag():
-                    with logging_lock:
-                        logging.info("Clipping operation stopped by user")
-                    ex._threads.clear()  # Clear threads to allow shutdown
-                    ex.shutdown(wait=False, cancel_futures=True)
-                    return False
-
-                nc_path, _ = future_to_nc[fut]
-                if fut.result():
-                    success += 1
-                else:
-                    with logging_lock:
-                        logging.error(f"Clipping failed for {nc_path.name}")
-                    raise RuntimeError(f"Clipping failed for {nc_path.name}")
+        ctx = multiprocessing.get_context()
+        stop_event = ctx.Event()
+        log_queue = ctx.Queue()
+        root = logging.getLogger()
+        listener = QueueListener(log_queue, *root.handlers, respect_handler_level=True)
+        listener.start()
+        try:
+            with ProcessPoolExecutor(max_workers=min(workers, len(nc_files)), mp_context=ctx, initializer=_init_clip_worker,
+                                     initargs=(geom, stop_event, log_queue, root.getEffectiveLevel())) as ex:
+                future_to_nc = {
+                    ex.submit(_clip_in_worker, nc_path, out_path): (nc_path, out_path)
+                    for nc_path, out_path in zip(nc_files, out_paths)
+                }
 
-                completed += 1
-                if completed >= next_mark:
-                    with logging_lock:
-                        logging.info(f"Progress: {completed}/{len(nc_files)} files "
-                                     f"(Successful: {success})")
-                    next_mark += progress_int
+                pending = set(future_to_nc)
+                while pending:
+                    done, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+                    if stop_flag and stop_flag():
+                        with logging_lock:
+                            logging.info("Clipping operation stopped by user")
+                        stop_event.set()
+                        ex.shutdown(wait=True, cancel_futures=True)
+                        return False
+
+                    for fut in done:
+                        nc_path, _ = future_to_nc[fut]
+                        if fut.result():
+                            success += 1
+                        else:
+                            with logging_lock:
+                                logging.error(f"Clipping failed for {nc_path.name}")
+                            stop_event.set()
+                            ex.shutdown(wait=True, cancel_futures=True)
+                            raise RuntimeError(f"Clipping failed for {nc_path.name}")
+
+                        completed += 1
+                        if completed >= next_mark:
+                            with logging_lock:
+                                logging.info(f"Progress: {completed}/{len(nc_files)} files "
+                                             f"(Successful: {success})")
+                            next_mark += progress_int
+        finally:
+            listener.stop()
 
         with logging_lock:
             logging.info(f"Completed: {success}/{len(nc_files)} files")
@@ -14,21 +14,30 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 import os
+import re
+import calendar
 import sys
 import json
+import mmap
+import socket
 import time
 import logging
 import requests
 from pathlib import Path
-from threading import Lock, Event
-from datetime import datetime
+from threading import Event, Thread
 from hashlib import md5, sha256
 from gridflow import __version__
-from urllib.parse import urlencode
+from urllib.parse import urlencode, urlparse
 from typing import List, Dict, Optional, Tuple
 from concurrent.futures import ThreadPoolExecutor, as_completed, Future
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
+from urllib3.connection import HTTPConnection
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib encoder
+    orjson = None
 
 ESGF_NODES = [
     "https://esgf-node.llnl.gov/esg-search/search",
@@ -37,13 +46,44 @@ ESGF_NODES = [
     "https://esgf-index1.ceda.ac.uk/esg-search/search"
 ]
 
+# Search parameters sent with every ESGF file query; callers' params override these
+BASE_QUERY_PARAMS = {
+    'type': 'File',
+    'project': 'CMIP5',
+    'format': 'application/solr+json',
+    'limit': '1000',
+    'distrib': 'true',
+}
+
+# Block size for streaming file contents through hashlib
+HASH_BLOCK_SIZE = 1 << 20
+# Bytes per iter_content step; large enough to keep Python overhead low, small enough for prompt stop checks
+STREAM_CHUNK_SIZE = 256 * 1024
+
+# Trailing YYYYMM[DD]-YYYYMM[DD] time range in CMIP file names
+TIME_RANGE_RE = re.compile(r'_(\d{8}|\d{6})-(\d{8}|\d{6})\.nc$')
+
+class TunedHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter whose sockets send keepalives, so half-open ESGF connections are noticed."""
+    # SO_RCVBUF is deliberately left alone: setting it disables the kernel's receive-buffer
+    # autotuning and is capped at net.core.rmem_max, which shrinks long-haul windows
+    SOCKET_OPTIONS = HTTPConnection.default_socket_options + [
+        (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+    ]
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs['socket_options'] = self.SOCKET_OPTIONS
+        super().init_poolmanager(*args, **kwargs)
+
 class InterruptibleSession(requests.Session):
-    def __init__(self, stop_event: Event):
+    def __init__(self, stop_event: Event, pool_maxsize: int = 10):
         super().__init__()
         self.stop_event = stop_event
         retries = Retry(total=3, backoff_factor=1, status_forcelist=[429, 500, 502, 503, 504])
-        self.mount("http://", HTTPAdapter(max_retries=retries))
-        self.mount("https://", HTTPAdapter(max_retries=retries))
+        # Keep one pooled keep-alive connection per concurrent request, so workers beyond the
+        # requests default of 10 do not discard connections and repeat TCP/TLS handshakes
+        self.mount("http://", TunedHTTPAdapter(max_retries=retries, pool_maxsize=pool_maxsize))
+        self.mount("https://", TunedHTTPAdapter(max_retries=retries, pool_maxsize=pool_maxsize))
 
     def get(self, url, **kwargs):
         kwargs.setdefault("timeout", (5, 1))
@@ -70,6 +110,7 @@ class FileManager:
         self.save_mode = save_mode.lower()
         self.prefix = prefix
         self.metadata_prefix = metadata_prefix
+        self._subdir_cache: Dict[Tuple[str, str, str], Path] = {}
         try:
             self.download_dir.mkdir(parents=True, exist_ok=True)
             self.metadata_dir.mkdir(parents=True, exist_ok=True)
@@ -88,39 +129,41 @@ class FileManager:
             prefixed_filename = f"{self.prefix}{institute}_{resolution}_{filename}"
             return self.download_dir / prefixed_filename
         else:
-            subdir = self.download_dir / variable / resolution / institute
-            subdir.mkdir(parents=True, exist_ok=True)
+            key = (variable, resolution, institute)
+            subdir = self._subdir_cache.get(key)
+            if subdir is None:
+                subdir = self.download_dir / variable / resolution / institute
+                subdir.mkdir(parents=True, exist_ok=True)
+                self._subdir_cache[key] = subdir
             return subdir / filename
 
     def save_metadata(self, files: List[Dict], filename: str) -> None:
         metadata_path = self.metadata_dir / f"{self.metadata_prefix}{filename}"
         try:
-            with open(metadata_path, 'w', encoding='utf-8') as f:
-                json.dump(files, f, indent=2)
+            if orjson is not None:
+                with open(metadata_path, 'wb') as f:
+                    f.write(orjson.dumps(files, option=orjson.OPT_INDENT_2))
+            else:
+                with open(metadata_path, 'w', encoding='utf-8') as f:
+                    json.dump(files, f, indent=2)
             logging.debug(f"Saved metadata to {metadata_path}")
         except Exception as e:
             logging.error(f"Failed to save metadata {filename}: {e}")
 
 class QueryHandler:
-    def __init__(self, nodes: List[str] = ESGF_NODES, stop_event: Optional[Event] = None):
+    def __init__(self, nodes: List[str] = ESGF_NODES, stop_event: Optional[Event] = None, session: Optional[requests.Session] = None):
         self.nodes = nodes
-        self.session = InterruptibleSession(stop_event if stop_event else Event())
+        # Reuse the caller's session when given so queries share its connection pool
+        self.session = session if session is not None else InterruptibleSession(stop_event if stop_event else Event())
         self.stop_event = stop_event
 
     def build_query(self, base_url: str, params: Dict[str, str]) -> str:
-        query_params = {
-            'type': 'File',
-            'project': 'CMIP5',
-            'format': 'application/solr+json',
-            'limit': '1000',
-            'distrib': 'true',
-            **params
-        }
-        return f"{base_url}?{urlencode(query_params, safe='/')}"
+        return f"{base_url}?{urlencode({**BASE_QUERY_PARAMS, **params}, safe='/')}"
 
     def fetch_datasets(self, params: Dict[str, str], timeout: int) -> List[Dict]:
         files = []
         seen_ids = set()
+        seen_titles = set()
         for node in self.nodes:
             if self.stop_event and self.stop_event.is_set():
                 logging.info("Stopping query due to stop event")
@@ -129,11 +172,22 @@ class QueryHandler:
                 logging.info(f"Trying to connect to {node}")
                 files = self._fetch_from_node(node, params, timeout)
                 unique_files = []
+                duplicate_titles = 0
                 for f in files:
                     file_id = f.get('id', '')
-                    if file_id and file_id not in seen_ids:
-                        seen_ids.add(file_id)
-                        unique_files.append(f)
+                    if not file_id or file_id in seen_ids:
+                        continue
+                    seen_ids.add(file_id)
+                    title = f.get('title')
+                    if not title:
+                        continue
+                    if title in seen_titles:
+                        duplicate_titles += 1
+                        continue
+                    seen_titles.add(title)
+                    unique_files.append(f)
+                if duplicate_titles:
+                    logging.debug(f"Removed {duplicate_titles} files with duplicate titles")
                 files = unique_files
                 if files:
                     logging.debug(f"Retrieved {len(files)} files from {node}")
@@ -151,17 +205,19 @@ class QueryHandler:
     def _fetch_from_node(self, node: str, params: Dict[str, str], timeout: int) -> List[Dict]:
         files = []
         offset = 0
+        # Only the offset changes between pages, so encode the rest of the query once
+        base_query = self.build_query(node, params)
         while True:
             if self.stop_event and self.stop_event.is_set():
                 logging.info("Stopping query due to stop event")
                 return files
-            query_params = {**params, 'offset': str(offset)}
-            query_url = self.build_query(node, query_params)
+            query_url = f"{base_query}&offset={offset}"
             logging.debug(f"Querying: {query_url}")
             try:
                 response = self.session.get(query_url, timeout=timeout)
                 response.raise_for_status()
-                data = response.json()
+                # Parse the raw body directly: orjson when available, and no intermediate text decode
+                data = orjson.loads(response.content) if orjson is not None else json.loads(response.content)
                 docs = data.get('response', {}).get('docs', [])
                 files.extend(docs)
                 num_found = int(data.get('response', {}).get('numFound', 0))
@@ -211,30 +267,36 @@ class QueryHandler:
         return None
 
 class Downloader:
-    def __init__(self, file_manager: FileManager, max_workers: int, retries: int, timeout: int, max_downloads: int, username: Optional[str], password: Optional[str], verify_ssl: bool, openid: Optional[str] = None):
+    # Files at least this large are fetched as parallel byte ranges
+    RANGE_THRESHOLD = 64 * 1024 * 1024
+    # Seconds between progress reports in download_all
+    PROGRESS_INTERVAL = 5.0
+
+    def __init__(self, file_manager: FileManager, max_workers: int, retries: int, timeout: int, max_downloads: int, username: Optional[str], password: Optional[str], verify_ssl: bool, openid: Optional[str] = None, parts: int = 4, stop_event: Optional[Event] = None):
         self.file_manager = file_manager
         self.max_workers = max_workers
         self.retries = retries
         self.timeout = timeout
         self.max_downloads = max_downloads
-        self.stop_event = Event()
-        self.session = InterruptibleSession(self.stop_event)
+        self.parts = parts
+        self.stop_event = stop_event if stop_event is not None else Event()
+        # Each worker may hold up to `parts` ranged connections at once
+        self.session = InterruptibleSession(self.stop_event, pool_maxsize=max(10, max_workers * max(1, parts)))
         self.verify_ssl = verify_ssl
-        self.log_lock = Lock()
         self.successful_downloads = 0
-        self.query_handler = QueryHandler(stop_event=self.stop_event)
+        # Download failures per host, shared across files so a failing replica node is tried last
+        self.host_failures: Dict[str, int] = {}
+        self.query_handler = QueryHandler(stop_event=self.stop_event, session=self.session)
         self.executor = None
         self.pending_futures: List[Future] = []
-        if username and password:
-            self.session.auth = (username, password)
-            with self.log_lock:
-                logging.warning("Using basic authentication; some ESGF nodes may require OAuth or other methods. Check ESGF documentation.")
+        # Credentials go on the data requests only; the shared session also talks to the search nodes
+        self.auth = (username, password) if username and password else None
+        if self.auth:
+            logging.warning("Using basic authentication; some ESGF nodes may require OAuth or other methods. Check ESGF documentation.")
         elif openid:
-            with self.log_lock:
-                logging.warning("OpenID provided but not implemented in this version. Downloads may fail for restricted data.")
+            logging.warning("OpenID provided but not implemented in this version. Downloads may fail for restricted data.")
         else:
-            with self.log_lock:
-                logging.warning("No authentication credentials provided. Downloads may fail for restricted data. Use --username and --password, or --openid for ESGF authentication.")
+            logging.warning("No authentication credentials provided. Downloads may fail for restricted data. Use --username and --password, or --openid for ESGF authentication.")
 
     def shutdown(self):
         self.stop_event.set()
@@ -246,6 +308,22 @@ class Downloader:
             self.pending_futures = []
         self.session.close()
 
+    @staticmethod
+    def _new_hash(checksum_type: str):
+        """Return a fresh hash object for an ESGF checksum type, or None if unsupported."""
+        if checksum_type == 'md5':
+            return md5()
+        if checksum_type == 'sha256':
+            return sha256()
+        return None
+
+    @staticmethod
+    def _checksum_matches(name: str, file_hash: str, checksum: str) -> bool:
+        if file_hash == checksum:
+            return True
+        logging.error(f"Checksum mismatch for {name}: expected {checksum}, got {file_hash}")
+        return False
+
     def verify_checksum(self, file_path: Path, file_info: Dict) -> bool:
         checksum = file_info.get('checksum', [''])[0]
         if not checksum:
@@ -253,100 +331,218 @@ class Downloader:
             return True
         try:
             checksum_type = file_info.get('checksum_type', ['sha256'])[0].lower()
-            with open(file_path, 'rb') as f:
-                data = f.read()
-                if checksum_type == 'md5':
-                    file_hash = md5(data).hexdigest()
-                elif checksum_type == 'sha256':
-                    file_hash = sha256(data).hexdigest()
-                else:
-                    logging.warning(f"Unsupported checksum type {checksum_type} for {file_path.name}")
-                    return True
-            if file_hash == checksum:
+            hasher = self._new_hash(checksum_type)
+            if hasher is None:
+                logging.warning(f"Unsupported checksum type {checksum_type} for {file_path.name}")
                 return True
-            logging.error(f"Checksum mismatch for {file_path.name}: expected {checksum}, got {file_hash}")
-            return False
+            # Hash in fixed-size blocks through one reused buffer, so memory stays flat for multi-GB files
+            buf = bytearray(HASH_BLOCK_SIZE)
+            view = memoryview(buf)
+            with open(file_path, 'rb', buffering=0) as f:
+                while True:
+                    n = f.readinto(buf)
+                    if not n:
+                        break
+                    hasher.update(view[:n])
+            file_hash = hasher.hexdigest()
+            return self._checksum_matches(file_path.name, file_hash, checksum)
         except Exception as e:
             logging.error(f"Checksum verification failed for {file_path.name}: {e}")
             return False
 
+    @staticmethod
+    def _expected_size(file_info: Dict) -> int:
+        size = file_info.get('size', 0)
+        if isinstance(size, list):
+            size = size[0] if size else 0
+        try:
+            return int(size)
+        except (TypeError, ValueError):
+            return 0
+
+    @staticmethod
+    def _checksum_path(file_path: Path) -> Path:
+        return file_path.with_suffix(file_path.suffix + '.checksum')
+
+    def _has_verified_checksum(self, file_path: Path, file_info: Dict) -> bool:
+        # The sidecar holds "<checksum> <size> <mtime_ns>" as of verification; any rewrite of the
+        # file since then, even at the same size, changes mtime and forces a re-hash
+        checksum = file_info.get('checksum', [''])[0]
+        if not checksum:
+            return False
+        try:
+            recorded = self._checksum_path(file_path).read_text(encoding='utf-8').split()
+            st = file_path.stat()
+        except OSError:
+            return False
+        return recorded == [checksum, str(st.st_size), str(st.st_mtime_ns)]
+
+    def _record_checksum(self, file_path: Path, file_info: Dict) -> None:
+        checksum = file_info.get('checksum', [''])[0]
+        if not checksum:
+            return
+        try:
+            st = file_path.stat()
+            self._checksum_path(file_path).write_text(f"{checksum} {st.st_size} {st.st_mtime_ns}", encoding='utf-8')
+        except OSError as e:
+            logging.debug(f"Failed to record checksum for {file_path.name}: {e}")
+
+    def _download_ranges(self, url: str, temp_path: Path, file_info: Dict) -> bool:
+        """Fetch a large file as parallel byte ranges; return False to fall back to a single stream."""
+        size = self._expected_size(file_info)
+        if self.parts < 2 or size < self.RANGE_THRESHOLD:
+            return False
+
+        try:
+            head = self.session.head(url, allow_redirects=True, verify=self.verify_ssl, timeout=self.timeout, auth=self.auth)
+            head.raise_for_status()
+        except requests.RequestException as e:
+            logging.debug(f"HEAD request failed for {url}: {e}, using a single stream")
+            return False
+        if head.headers.get('Accept-Ranges', '').lower() != 'bytes':
+            return False
+        size = int(head.headers.get('Content-Length', size))
+
+        ranges = [(i * size // self.parts, (i + 1) * size // self.parts - 1) for i in range(self.parts)]
+        with open(temp_path, 'wb') as f:
+            f.truncate(size)
+        with ThreadPoolExecutor(max_workers=self.parts) as pool:
+            futures = [pool.submit(self._download_range, url, temp_path, start, end) for start, end in ranges]
+            for future in as_completed(futures):
+                future.result()
+        logging.debug(f"Fetched {temp_path.name} in {self.parts} ranges ({size} bytes)")
+        return True
+
+    def _download_range(self, url: str, temp_path: Path, start: int, end: int) -> None:
+        response = self.session.get(url, stream=True, verify=self.verify_ssl, auth=self.auth, headers={'Range': f'bytes={start}-{end}'})
+        response.raise_for_status()
+        if response.status_code != 206:
+            response.close()
+            raise ValueError(f"Server ignored range request for bytes {start}-{end}")
+        received = 0
+        with open(temp_path, 'r+b') as f:
+            f.seek(start)
+            for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+                if self.stop_event.is_set():
+                    response.close()
+                    return
+                if chunk:
+                    f.write(chunk)
+                    received += len(chunk)
+        # The file was pre-sized, so a short range would otherwise leave a silent hole of zeros
+        if received != end - start + 1:
+            raise ValueError(f"Range {start}-{end} ended after {received} of {end - start + 1} bytes")
+
+    def _host_failure_count(self, url: str) -> int:
+        return self.host_failures.get(urlparse(url).netloc, 0)
+
+    def _record_host_failure(self, url: str) -> None:
+        # Unlocked read-modify-write: a lost increment under contention only weakens the ordering hint
+        host = urlparse(url).netloc
+        self.host_failures[host] = self.host_failures.get(host, 0) + 1
+
     def download_file(self, file_info: Dict, attempt: int = 1) -> Tuple[Optional[str], Optional[Dict]]:
         if self.stop_event.is_set():
-            with self.log_lock:
-                logging.info(f"Skipping download of {file_info.get('title', '')} due to stop event")
+            logging.info(f"Skipping download of {file_info.get('title', '')} due to stop event")
             return None, file_info
 
         urls = file_info.get('url', [])
         filename = file_info.get('title', '')
         if not urls or not filename:
-            with self.log_lock:
-                logging.error(f"Invalid file info: missing URLs or title")
+            logging.error(f"Invalid file info: missing URLs or title")
             return None, file_info
 
         output_path = self.file_manager.get_output_path(file_info)
         temp_path = output_path.with_suffix(output_path.suffix + '.tmp')
 
         if output_path.exists():
-            if self.verify_checksum(output_path, file_info):
-                with self.log_lock:
-                    logging.info(f"Downloaded {filename} (already exists)")
+            # Cheap checks first: a size mismatch rejects outright, a matching sidecar skips hashing
+            expected_size = self._expected_size(file_info)
+            if expected_size and output_path.stat().st_size != expected_size:
+                logging.warning(f"Size mismatch for existing {filename}, downloading again")
+                valid = False
+            elif self._has_verified_checksum(output_path, file_info):
+                valid = True
+            else:
+                valid = self.verify_checksum(output_path, file_info)
+                if valid:
+                    self._record_checksum(output_path, file_info)
+            if valid:
+                logging.info(f"Downloaded {filename} (already exists)")
                 return str(output_path), None
             else:
                 try:
                     output_path.unlink()
+                    self._checksum_path(output_path).unlink(missing_ok=True)
                 except Exception as e:
                     logging.error(f"Failed to remove existing file {output_path}: {e}")
 
+        download_urls = []
         for url in urls:
             if isinstance(url, str) and "HTTPServer" in url:
-                download_url = url.split('|')[0]
+                download_urls.append(url.split('|')[0])
             elif isinstance(url, list) and len(url) > 0 and "HTTPServer" in url[1]:
-                download_url = url[0]
-            else:
-                continue
-            try:
-                with self.log_lock:
-                    logging.info(f"Downloading {filename} from {download_url}")
-                response = self.session.get(download_url, stream=True, verify=self.verify_ssl)
-                response.raise_for_status()
+                download_urls.append(url[0])
+        if not download_urls:
+            logging.error(f"Failed to download {filename} after {self.retries} attempts")
+            return None, file_info
 
-                with open(temp_path, 'wb') as f:
-                    for chunk in response.iter_content(chunk_size=8192):
+        # Each attempt tries every replica once, hosts that have failed least first, before backing off
+        last_error = None
+        for attempt in range(attempt, self.retries + 2):
+            for download_url in sorted(download_urls, key=self._host_failure_count):
+                try:
+                    logging.info(f"Downloading {filename} from {download_url}")
+                    hasher = None
+                    if self._download_ranges(download_url, temp_path, file_info):
                         if self.stop_event.is_set():
-                            with self.log_lock:
-                                logging.info(f"Stopping download of {filename} due to stop event")
-                            response.close()
+                            logging.info(f"Stopping download of {filename} due to stop event")
                             return None, file_info
-                        if chunk:
-                            f.write(chunk)
-                if self.verify_checksum(temp_path, file_info):
-                    temp_path.rename(output_path)
-                    with self.log_lock:
+                    else:
+                        response = self.session.get(download_url, stream=True, verify=self.verify_ssl, auth=self.auth)
+                        response.raise_for_status()
+
+                        # Hash the bytes as they arrive so the finished file need not be read back
+                        checksum = file_info.get('checksum', [''])[0]
+                        if checksum:
+                            hasher = self._new_hash(file_info.get('checksum_type', ['sha256'])[0].lower())
+                        with open(temp_path, 'wb') as f:
+                            for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+                                if self.stop_event.is_set():
+                                    logging.info(f"Stopping download of {filename} due to stop event")
+                                    response.close()
+                                    return None, file_info
+                                if chunk:
+                                    f.write(chunk)
+                                    if hasher is not None:
+                                        hasher.update(chunk)
+                    if hasher is not None:
+                        valid = self._checksum_matches(filename, hasher.hexdigest(), checksum)
+                    else:
+                        valid = self.verify_checksum(temp_path, file_info)
+                    if valid:
+                        temp_path.rename(output_path)
+                        self._record_checksum(output_path, file_info)
                         logging.info(f"Downloaded {filename} to {output_path}")
-                    return str(output_path), None
-                else:
-                    try:
-                        temp_path.unlink()
-                    except Exception as e:
-                        logging.error(f"Failed to remove temp file {temp_path}: {e}")
-                    raise ValueError("Checksum verification failed")
-
-            except (requests.RequestException, ValueError) as e:
-                if self.stop_event.is_set():
-                    with self.log_lock:
+                        return str(output_path), None
+                    else:
+                        try:
+                            temp_path.unlink()
+                        except Exception as e:
+                            logging.error(f"Failed to remove temp file {temp_path}: {e}")
+                        raise ValueError("Checksum verification failed")
+
+                except (requests.RequestException, ValueError) as e:
+                    if self.stop_event.is_set():
                         logging.info(f"Stopping download of {filename} due to stop event")
-                    return None, file_info
-                with self.log_lock:
+                        return None, file_info
                     logging.warning(f"Attempt {attempt} failed for {filename} from {download_url}: {e}")
-                if attempt <= self.retries:
-                    time.sleep(2 ** attempt + 5)
-                    return self.download_file(file_info, attempt + 1)
-                with self.log_lock:
-                    logging.error(f"Failed to download {filename} after {self.retries} attempts: {e}")
-                return None, file_info
-
-        with self.log_lock:
-            logging.error(f"Failed to download {filename} after {self.retries} attempts")
+                    self._record_host_failure(download_url)
+                    last_error = e
+            if attempt <= self.retries:
+                time.sleep(2 ** attempt + 5)
+
+        logging.error(f"Failed to download {filename} after {self.retries} attempts: {last_error}")
         return None, file_info
 
     def download_all(self, files: List[Dict], phase: str = "initial") -> Tuple[List[str], List[Dict]]:
@@ -354,21 +550,18 @@ class Downloader:
         failed_files = []
         total_files = min(len(files), self.max_downloads) if self.max_downloads else len(files)
         if total_files == 0:
-            with self.log_lock:
-                logging.info("No files to download")
+            logging.info("No files to download")
             return [], []
 
-        progress_interval = max(1, total_files // 10)
-        completed = 0
-        next_threshold = progress_interval
+        done = Event()
+        Thread(target=self._report_progress, args=(total_files, failed_files, done), daemon=True).start()
 
         self.executor = ThreadPoolExecutor(max_workers=self.max_workers)
         try:
             self.pending_futures = [self.executor.submit(self.download_file, f) for f in files[:total_files]]
             for future in as_completed(self.pending_futures):
                 if self.stop_event.is_set():
-                    with self.log_lock:
-                        logging.info("Download operation stopped by user")
+                    logging.info("Download operation stopped by user")
                     break
                 try:
                     path, failed_info = future.result()
@@ -379,26 +572,27 @@ class Downloader:
                     if failed_info:
                         failed_files.append(failed_info)
                 except Exception as e:
-                    with self.log_lock:
-                        logging.error(f"Unexpected error in download task: {e}")
+                    logging.error(f"Unexpected error in download task: {e}")
                     failed_files.append(files[self.pending_futures.index(future)])
-                completed += 1
-                with self.log_lock:
-                    if completed >= next_threshold:
-                        logging.info(f"Progress: {self.successful_downloads}/{total_files} files (Failed: {len(failed_files)})")
-                        next_threshold += progress_interval
         finally:
+            done.set()
             if self.stop_event.is_set():
                 self.shutdown()
 
-        # with self.log_lock:
-        #     logging.info(f"Progress: {self.successful_downloads}/{total_files} files (Failed: {len(failed_files)})")
+        if not self.stop_event.is_set():
+            logging.info(f"Progress: {self.successful_downloads}/{total_files} files (Failed: {len(failed_files)})")
         return downloaded_files, failed_files
 
+    def _report_progress(self, total_files: int, failed_files: List[Dict], done: Event) -> None:
+        # Time-based progress so large jobs don't pay for a log record per completed file
+        while not done.wait(self.PROGRESS_INTERVAL):
+            if self.stop_event.is_set():
+                return
+            logging.info(f"Progress: {self.successful_downloads}/{total_files} files (Failed: {len(failed_files)})")
+
     def retry_failed(self, failed_files: List[Dict]) -> Tuple[List[str], List[Dict]]:
         if not failed_files:
-            with self.log_lock:
-                logging.info("No failed files to retry")
+            logging.info("No failed files to retry")
             return [], []
 
         total_files = len(failed_files)
@@ -408,12 +602,10 @@ class Downloader:
 
         while remaining_failed and retry_round < self.retries:
             if self.stop_event.is_set():
-                with self.log_lock:
-                    logging.info("Retry operation stopped by user")
+                logging.info("Retry operation stopped by user")
                 return downloaded_files, remaining_failed
             retry_round += 1
-            with self.log_lock:
-                logging.info(f"Retry round {retry_round} for {len(remaining_failed)} failed files")
+            logging.info(f"Retry round {retry_round} for {len(remaining_failed)} failed files")
             current_failed = []
 
             self.executor = ThreadPoolExecutor(max_workers=self.max_workers)
@@ -421,17 +613,14 @@ class Downloader:
                 self.pending_futures = []
                 for file_info in remaining_failed:
                     if self.stop_event.is_set():
-                        with self.log_lock:
-                            logging.info("Retry operation stopped by user")
+                        logging.info("Retry operation stopped by user")
                         break
                     filename = file_info.get('title', 'unknown')
-                    with self.log_lock:
-                        logging.info(f"Retrying {filename} (Round {retry_round})")
+                    logging.info(f"Retrying {filename} (Round {retry_round})")
 
                     updated_file_info = self.query_handler.fetch_specific_file(file_info, self.timeout)
                     if not updated_file_info:
-                        with self.log_lock:
-                            logging.error(f"Could not find updated metadata for {filename}, skipping retry")
+                        logging.error(f"Could not find updated metadata for {filename}, skipping retry")
                         current_failed.append(file_info)
                         continue
 
@@ -440,8 +629,7 @@ class Downloader:
 
                 for future in as_completed(self.pending_futures):
                     if self.stop_event.is_set():
-                        with self.log_lock:
-                            logging.info("Retry operation stopped by user")
+                        logging.info("Retry operation stopped by user")
                         break
                     file_info = remaining_failed[self.pending_futures.index(future)]
                     filename = file_info.get('title', 'unknown')
@@ -450,15 +638,12 @@ class Downloader:
                         if path:
                             downloaded_files.append(path)
                             self.successful_downloads += 1
-                            with self.log_lock:
-                                logging.info(f"Successfully downloaded {filename} after retry")
+                            logging.info(f"Successfully downloaded {filename} after retry")
                         if failed_info:
                             current_failed.append(failed_info)
-                        with self.log_lock:
-                            logging.info(f"Progress: {self.successful_downloads}/{total_files} files (Failed: {len(current_failed)})")
+                        logging.info(f"Progress: {self.successful_downloads}/{total_files} files (Failed: {len(current_failed)})")
                     except Exception as e:
-                        with self.log_lock:
-                            logging.error(f"Unexpected error retrying {filename}: {e}")
+                        logging.error(f"Unexpected error retrying {filename}: {e}")
                         current_failed.append(file_info)
             finally:
                 if self.stop_event.is_set():
@@ -468,36 +653,48 @@ class Downloader:
 
         return downloaded_files, remaining_failed
 
+def read_json(path) -> object:
+    """Parse a JSON file, letting orjson read straight from a memory map when it is installed."""
+    with open(path, 'rb') as f:
+        if orjson is None:
+            return json.loads(f.read())
+        if os.fstat(f.fileno()).st_size == 0:
+            return orjson.loads(b'')
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf, memoryview(buf) as view:
+            return orjson.loads(view)
+
 def load_config(config_path: str) -> Dict:
     if not config_path:
         return {}
     try:
-        with open(config_path, 'r', encoding='utf-8') as f:
-            config = json.load(f)
+        config = read_json(config_path)
         logging.debug(f"Loaded configuration from {config_path}")
         return config
     except (json.JSONDecodeError, FileNotFoundError) as e:
         logging.error(f"Failed to load config file {config_path}: {e}")
         sys.exit(1)
 
+def _iso_date(stamp: str) -> str:
+    return f"{stamp[:4]}-{stamp[4:6]}-{stamp[6:8]}" if len(stamp) == 8 else f"{stamp[:4]}-{stamp[4:6]}-01"
+
+def _is_valid_stamp(stamp: str) -> bool:
+    """True if a YYYYMM or YYYYMMDD stamp is a real date, the same dates strptime would accept."""
+    year, month = int(stamp[:4]), int(stamp[4:6])
+    if year < 1 or not 1 <= month <= 12:
+        return False
+    return len(stamp) == 6 or 1 <= int(stamp[6:8]) <= calendar.monthrange(year, month)[1]
+
 def parse_file_time_range(filename: str) -> Tuple[Optional[str], Optional[str]]:
-    try:
-        time_part = filename.split('_')[-1].replace('.nc', '')
-        start_date, end_date = time_part.split('-')
-        if len(start_date) == 8:
-            start_date = f"{start_date[:4]}-{start_date[4:6]}-{start_date[6:8]}"
-            end_date = f"{end_date[:4]}-{end_date[4:6]}-{end_date[6:8]}"
-        elif len(start_date) == 6:
-            start_date = f"{start_date[:4]}-{start_date[4:6]}-01"
-            end_date = f"{end_date[:4]}-{end_date[4:6]}-01"
-        else:
-            raise ValueError(f"Unsupported date format in {time_part}")
-        datetime.strptime(start_date, '%Y-%m-%d')
-        datetime.strptime(end_date, '%Y-%m-%d')
-        return start_date, end_date
-    except Exception as e:
-        logging.debug(f"Failed to parse time range from {filename}: {e}")
+    match = TIME_RANGE_RE.search(filename)
+    if not match or len(match.group(1)) != len(match.group(2)):
+        logging.debug(f"Failed to parse time range from {filename}: unsupported date format")
         return None, None
+    start, end = match.group(1), match.group(2)
+    # Calendar check (month 13, day 32, Feb 29 outside leap years) with integer comparisons
+    if not (_is_valid_stamp(start) and _is_valid_stamp(end)):
+        logging.debug(f"Failed to parse time range from {filename}: invalid date in {start}-{end}")
+        return None, None
+    return _iso_date(start), _iso_date(end)
 
 def run_download(args) -> None:
     try:
@@ -505,84 +702,8 @@ def run_download(args) -> None:
         prefix = ""
         metadata_prefix = f"gridflow_{args.project.lower()}_"
 
-        if args.retry_failed:
-            retry_file_path = Path(args.retry_failed)
-            if not retry_file_path.exists():
-                logging.error(f"Retry file {args.retry_failed} does not exist.")
-                sys.exit(1)
-            if not retry_file_path.is_file():
-                logging.error(f"Retry file {args.retry_failed} is not a file.")
-                sys.exit(1)
-            try:
-                with open(retry_file_path, 'r', encoding='utf-8') as f:
-                    files = json.load(f)
-            except Exception as e:
-                logging.error(f"Failed to read {args.retry_failed}: {e}")
-                sys.exit(1)
-            if not files:
-                logging.info("No failed files to retry")
-                sys.exit(0)
-        else:
-            config = load_config(args.config) if args.config else {}
-            params = {
-                'project': config.get('product', args.project),
-                'model': config.get('model', args.model),
-                'experiment': config.get('experiment', args.experiment),
-                'time_frequency': config.get('time_frequency', args.frequency),
-                'variable': config.get('variable', args.variable),
-                'ensemble': config.get('ensemble', args.ensemble),
-                'institute': config.get('institute', args.institute),
-            }
-            logging.debug(f"Query parameters: {params}")
-            if args.latest or config.get('latest', False):
-                params['latest'] = 'true'
-            if args.extra_params:
-                try:
-                    params.update(json.loads(args.extra_params))
-                except json.JSONDecodeError as e:
-                    logging.error(f"Invalid extra-params JSON: {e}")
-                    sys.exit(1)
-            params = {k: v for k, v in params.items() if v is not None}
-
-            if args.demo or args.test:
-                params = {
-                    'project': 'CMIP5',
-                    'variable': 'tas',
-                    'model': 'CanESM2',
-                    'experiment': 'historical',
-                    'time_frequency': 'mon',
-                    'ensemble': 'r1i1p1',
-                    'limit': '10'
-                }
-                if args.demo:
-                    args.max_downloads = 10
-                    logging.info("Downloading CMIP5 tas files in demo mode")
-
-            if not params:
-                logging.error("No valid search parameters provided")
-                sys.exit(1)
-
-            query_handler = QueryHandler(stop_event=getattr(args, 'stop_event', None))
-            files = query_handler.fetch_datasets(params, args.timeout)
-            if not files:
-                logging.error("No files found matching the query")
-                sys.exit(1)
-
-            files_by_title = {f['title']: f for f in files if 'title' in f}
-            removed_count = len(files) - len(files_by_title)
-            if removed_count > 0:
-                logging.debug(f"Removed {removed_count} files with duplicate titles")
-            files = list(files_by_title.values())
-
-            logging.info(f"Found {len(files)} files")
-
         file_manager = FileManager(args.output_dir, args.metadata_dir, args.save_mode, prefix, metadata_prefix)
-        if not args.retry_failed:
-            file_manager.save_metadata(files, "query_results.json")
-        if args.dry_run:
-            logging.info(f"Dry run: Would download {len(files)} files")
-            sys.exit(0)
-
+        # Built before the search so the query and the downloads share one session
         downloader = Downloader(
             file_manager,
             args.workers,
@@ -592,9 +713,79 @@ def run_download(args) -> None:
             args.id if hasattr(args, 'id') else None,
             args.password if hasattr(args, 'password') else None,
             not args.no_verify_ssl,
-            args.openid if hasattr(args, 'openid') else None
+            args.openid if hasattr(args, 'openid') else None,
+            stop_event=getattr(args, 'stop_event', None)
         )
         try:
+            if args.retry_failed:
+                retry_file_path = Path(args.retry_failed)
+                if not retry_file_path.exists():
+                    logging.error(f"Retry file {args.retry_failed} does not exist.")
+                    sys.exit(1)
+                if not retry_file_path.is_file():
+                    logging.error(f"Retry file {args.retry_failed} is not a file.")
+                    sys.exit(1)
+                try:
+                    files = read_json(retry_file_path)
+                except Exception as e:
+                    logging.error(f"Failed to read {args.retry_failed}: {e}")
+                    sys.exit(1)
+                if not files:
+                    logging.info("No failed files to retry")
+                    sys.exit(0)
+            else:
+                config = load_config(args.config) if args.config else {}
+                params = {
+                    'project': config.get('product', args.project),
+                    'model': config.get('model', args.model),
+                    'experiment': config.get('experiment', args.experiment),
+                    'time_frequency': config.get('time_frequency', args.frequency),
+                    'variable': config.get('variable', args.variable),
+                    'ensemble': config.get('ensemble', args.ensemble),
+                    'institute': config.get('institute', args.institute),
+                }
+                logging.debug(f"Query parameters: {params}")
+                if args.latest or config.get('latest', False):
+                    params['latest'] = 'true'
+                if args.extra_params:
+                    try:
+                        params.update(json.loads(args.extra_params))
+                    except json.JSONDecodeError as e:
+                        logging.error(f"Invalid extra-params JSON: {e}")
+                        sys.exit(1)
+                params = {k: v for k, v in params.items() if v is not None}
+
+                if args.demo or args.test:
+                    params = {
+                        'project': 'CMIP5',
+                        'variable': 'tas',
+                        'model': 'CanESM2',
+                        'experiment': 'historical',
+                        'time_frequency': 'mon',
+                        'ensemble': 'r1i1p1',
+                        'limit': '10'
+                    }
+                    if args.demo:
+                        args.max_downloads = 10
+                        logging.info("Downloading CMIP5 tas files in demo mode")
+
+                if not params:
+                    logging.error("No valid search parameters provided")
+                    sys.exit(1)
+
+                files = downloader.query_handler.fetch_datasets(params, args.timeout)
+                if not files:
+                    logging.error("No files found matching the query")
+                    sys.exit(1)
+
+                logging.info(f"Found {len(files)} files")
+
+            if not args.retry_failed:
+                file_manager.save_metadata(files, "query_results.json")
+            if args.dry_run:
+                logging.info(f"Dry run: Would download {len(files)} files")
+                sys.exit(0)
+
             downloaded, failed = downloader.download_all(files, phase="initial")
             if failed:
                 file_manager.save_metadata(failed, "failed_downloads.json")
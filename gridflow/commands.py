@@ -17,14 +17,12 @@ import sys
 import argparse
 import logging
 import signal
+import threading
 from pathlib import Path
 from .logging_utils import setup_logging
-from .cmip6_downloader import run_download as cmip6_run_download
-from .cmip5_downloader import run_download as cmip5_run_download
-from .prism_downloader import download_prism
-from .crop_netcdf import crop_netcdf
-from .clip_netcdf import clip_netcdf
-from .catalog_generator import generate_catalog
+
+# Command backends are imported inside each *_command so a CLI run only pays for the
+# modules (requests, netCDF4, geopandas, ...) that its subcommand actually uses
 
 def setup_backend_logging(args, project_prefix: str) -> None:
     if not any(isinstance(h, logging.FileHandler) for h in logging.getLogger().handlers):
@@ -49,12 +47,34 @@ class StopFlag:
     def stop(self):
         self._stopped = True
 
+def install_stop_handlers(stop_flag: StopFlag) -> None:
+    """
+    Turn SIGINT/SIGTERM into stop_flag.stop() so workers wind down and partial outputs are removed.
+
+    Not used by the CMIP5/CMIP6 download commands: their run_download never polls args.stop_flag
+    and instead relies on Ctrl-C raising KeyboardInterrupt, which unwinds into Downloader.shutdown()
+    (cancel pending futures, set the session's stop event). Swallowing SIGINT here would stop that.
+    """
+    if threading.current_thread() is not threading.main_thread():
+        return  # Signal handlers can only be installed from the main thread (not from the GUI worker)
+
+    def handler(signum, frame):
+        if stop_flag():
+            raise KeyboardInterrupt  # Second signal: stop waiting for running tasks
+        logging.info("Stop requested, finishing running tasks (interrupt again to abort)")
+        stop_flag.stop()
+
+    signal.signal(signal.SIGINT, handler)
+    signal.signal(signal.SIGTERM, handler)
+
 def download_command(args):
+    from .cmip6_downloader import run_download as cmip6_run_download
     setup_backend_logging(args, project_prefix="cmip6")
     args.stop_flag = StopFlag()
     cmip6_run_download(args)
 
 def download_cmip5_command(args):
+    from .cmip5_downloader import run_download as cmip5_run_download
     setup_backend_logging(args, project_prefix="cmip5")
     args.stop_flag = StopFlag()
     if hasattr(args, 'time_frequency'):
@@ -62,8 +82,10 @@ def download_cmip5_command(args):
     cmip5_run_download(args)
 
 def download_prism_command(args):
+    from .prism_downloader import download_prism
     setup_backend_logging(args, project_prefix="prism")
     args.stop_flag = StopFlag()
+    install_stop_handlers(args.stop_flag)
     if args.demo:
         args.variable = "tmean"
         args.resolution = "4km"
@@ -88,8 +110,10 @@ def download_prism_command(args):
     )
 
 def crop_command(args):
+    from .crop_netcdf import crop_netcdf
     setup_backend_logging(args, project_prefix="crop")
     args.stop_flag = StopFlag()
+    install_stop_handlers(args.stop_flag)
     if not args.demo and any(arg is None for arg in [args.min_lat, args.max_lat, args.min_lon, args.max_lon]):
         logging.error("All spatial bounds (--min-lat, --max-lat, --min-lon, --max-lon) must be provided unless --demo")
         sys.exit(1)
@@ -103,12 +127,16 @@ def crop_command(args):
         buffer_km=args.buffer_km,
         stop_flag=args.stop_flag,
         workers=args.workers,
-        demo=args.demo
+        demo=args.demo,
+        compression=getattr(args, 'compression', 'zlib'),
+        complevel=getattr(args, 'complevel', None)
     )
 
 def clip_command(args):
+    from .clip_netcdf import clip_netcdf
     setup_backend_logging(args, project_prefix="clip")
     args.stop_flag = StopFlag()
+    install_stop_handlers(args.stop_flag)
     shapefile_path = getattr(args, "shapefile_path", None)
     clip_netcdf(
         input_dir=args.input_dir,
@@ -120,8 +148,10 @@ def clip_command(args):
     )
 
 def catalog_command(args):
+    from .catalog_generator import generate_catalog
     setup_backend_logging(args, project_prefix="catalog")
     args.stop_flag = StopFlag()
+    install_stop_handlers(args.stop_flag)
     result = generate_catalog(
         input_dir=args.input_dir,
         output_dir=args.output_dir,
@@ -216,6 +246,8 @@ def main():
     crop_parser.add_argument('--buffer-km', type=float, default=0.0, help='Buffer distance in kilometers')
     crop_parser.add_argument('--log-level', default='minimal', choices=['minimal', 'normal', 'verbose', 'debug'])
     crop_parser.add_argument('--workers', type=int)
+    crop_parser.add_argument('--compression', default='zlib', choices=['zlib', 'zstd', 'none'], help='Output compression codec')
+    crop_parser.add_argument('--complevel', type=int, choices=range(1, 10), metavar='{1-9}', help='Compression level (default: 4 for zlib, 3 for zstd)')
     crop_parser.add_argument('--demo', action='store_true', help='Run in demo mode with sample spatial bounds')
 
     # Clip
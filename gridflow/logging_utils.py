@@ -19,29 +19,27 @@ from pathlib import Path
 from datetime import datetime
 
 class MinimalFilter(logging.Filter):
+    # INFO messages that pass in minimal mode: any of these prefixes (one C-level startswith
+    # over the tuple) or any of these substrings
+    _PREFIXES = (
+        'Found ', 'Starting ', 'Executing ', 'Connected to', 'Catalog saved to',
+        'Trying to connect to', 'Cropped file created:', 'Clipped file created:',
+    )
+    _SUBSTRINGS = ('Progress:', 'Completed:', 'Downloaded', 'Task started', 'Task completed')
+
     def filter(self, record):
         # Allow CRITICAL and ERROR messages to pass through unfiltered
         if record.levelno >= logging.ERROR:
             return True
-        # Filter INFO messages to specific patterns
-        return record.levelno == logging.INFO and (
-            'Progress:' in record.getMessage() or
-            'Completed:' in record.getMessage() or
-            'Downloaded' in record.getMessage() or
-            'Task started' in record.getMessage() or
-            'Task completed' in record.getMessage() or
-
-            record.getMessage().startswith('Found ') or
-            record.getMessage().startswith('Starting ') or
-            record.getMessage().startswith('Progress:') or
-            record.getMessage().startswith('Executing ') or
-            record.getMessage().startswith('Connected to') or 
-            record.getMessage().startswith('Catalog saved to') or
-            record.getMessage().startswith('Trying to connect to') or
-            record.getMessage().startswith('Cropped file created:') or
-            record.getMessage().startswith('Clipped file created:') 
-            
-        )
+        if record.levelno != logging.INFO:
+            return False
+        # Most messages here are f-strings without args: check the raw string and only
+        # pay for %-formatting when there is something to interpolate
+        if not record.args and isinstance(record.msg, str):
+            msg = record.msg
+        else:
+            msg = record.getMessage()
+        return msg.startswith(self._PREFIXES) or any(s in msg for s in self._SUBSTRINGS)
 
 def setup_logging(log_dir: str, log_level: str, prefix: str = "") -> None:
     try:
@@ -83,6 +81,13 @@ def setup_logging(log_dir: str, log_level: str, prefix: str = "") -> None:
                 handler.setFormatter(logging.Formatter(standard_format))
             logger.addHandler(handler)
 
+        # None of the formats above use caller, thread or process fields, so skip
+        # collecting them (a stack-frame walk plus thread/PID lookups) for every record
+        logging._srcfile = None
+        logging.logThreads = False
+        logging.logProcesses = False
+        logging.logMultiprocessing = False
+
         logging.debug(f"Logging initialized for {log_file}")
     except Exception as e:
         print(f"Failed to initialize logging: {e}, using console-only logging", file=sys.stderr)
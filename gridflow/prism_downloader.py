@@ -15,18 +15,40 @@
 
 import logging
 import requests
+from requests.adapters import HTTPAdapter
 import hashlib
 import os
 import json
+import time
+import itertools
 from pathlib import Path
 from datetime import datetime, timedelta
 from dateutil.relativedelta import relativedelta
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from threading import Lock
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from typing import List, Dict, Optional, Tuple
 
-logging_lock = Lock()
-success_lock = Lock()
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib encoder
+    orjson = None
+
+# Read/write block size for downloads and hashing: few Python-level calls per file
+CHUNK_SIZE = 1 << 20
+
+def make_session(pool_size: int) -> requests.Session:
+    """Session whose connection pool keeps *pool_size* connections to the PRISM host alive."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+# Upper bound in seconds on the pause between download retries
+MAX_RETRY_DELAY = 30
+
+# Seconds a cached "available" answer is trusted before the date is checked again
+AVAILABILITY_CACHE_TTL = 7 * 24 * 3600
 
 class FileManager:
     def __init__(self, download_dir: str, metadata_dir: str, metadata_prefix: str = ""):
@@ -37,71 +59,97 @@ class FileManager:
             self.download_dir.mkdir(parents=True, exist_ok=True)
             self.metadata_dir.mkdir(parents=True, exist_ok=True)
         except Exception as e:
-            with logging_lock:
-                logging.error(f"Failed to create directories {self.download_dir} or {self.metadata_dir}: {e}")
+            logging.error(f"Failed to create directories {self.download_dir} or {self.metadata_dir}: {e}")
             raise
 
     def get_output_path(self, variable: str, resolution: str, date_str: str) -> Path:
         output_filename = f"prism_{variable}_us_{resolution}_{date_str}.zip"
         return self.download_dir / output_filename
 
+    def load_availability_cache(self) -> Dict[str, Dict]:
+        """Return cached availability results keyed by variable/resolution/time_step/date."""
+        cache_path = self.metadata_dir / f"{self.metadata_prefix}availability_cache.json"
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+            return cache if isinstance(cache, dict) else {}
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable availability cache {cache_path}: {e}")
+            return {}
+
+    def save_availability_cache(self, cache: Dict[str, Dict]) -> None:
+        cache_path = self.metadata_dir / f"{self.metadata_prefix}availability_cache.json"
+        try:
+            with open(cache_path, 'w', encoding='utf-8') as f:
+                json.dump(cache, f)
+            logging.debug("Saved availability cache to %s", cache_path)
+        except OSError as e:
+            logging.warning(f"Failed to save availability cache to {cache_path}: {e}")
+
     def save_metadata(self, files: List[Dict], filename: str) -> None:
         metadata_path = self.metadata_dir / f"{self.metadata_prefix}{filename}"
         try:
-            # Convert Path objects to strings for JSON serialization
-            serializable_files = [
-                {k: str(v) if isinstance(v, Path) else v for k, v in file.items()}
-                for file in files
-            ]
-            with open(metadata_path, 'w', encoding='utf-8') as f:
-                json.dump(serializable_files, f, indent=2)
-            with logging_lock:
-                logging.debug(f"Saved metadata to {metadata_path}")
+            # default=str turns Path values into strings as they are reached instead of
+            # copying every entry up front
+            if orjson is not None:
+                with open(metadata_path, 'wb') as f:
+                    f.write(orjson.dumps(files, default=str, option=orjson.OPT_INDENT_2))
+            else:
+                with open(metadata_path, 'w', encoding='utf-8') as f:
+                    json.dump(files, f, indent=2, default=str)
+            logging.debug("Saved metadata to %s", metadata_path)
         except Exception as e:
-            with logging_lock:
-                logging.error(f"Failed to save metadata to {metadata_path}: {e}")
+            logging.error(f"Failed to save metadata to {metadata_path}: {e}")
             raise
 
 def compute_sha256(file_path: Path) -> str:
-    sha256_hash = hashlib.sha256()
     with open(file_path, 'rb') as f:
-        for chunk in iter(lambda: f.read(8192), b''):
+        # Python 3.11+: the read/update loop runs in C with a large buffer
+        if hasattr(hashlib, 'file_digest'):
+            return hashlib.file_digest(f, 'sha256').hexdigest()
+        sha256_hash = hashlib.sha256()
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
             sha256_hash.update(chunk)
     return sha256_hash.hexdigest()
 
-def check_data_availability(variable: str, resolution: str, time_step: str, year: int, date_str: str) -> Optional[Dict]:
+def check_data_availability(variable: str, resolution: str, time_step: str, year: int, date_str: str,
+                            session: Optional[requests.Session] = None) -> Optional[Dict]:
+    # download_prism passes its Downloader's pooled session; standalone calls use plain requests
+    if session is None:
+        session = requests
     res_label = '30s' if resolution == '800m' else '25m'  # Mapping: 4km -> 25m, 800m -> 30s
     base_url = f"https://data.prism.oregonstate.edu/time_series/us/an/{resolution}/{variable}/{time_step}/{year}/"
     filename = f"prism_{variable}_us_{res_label}_{date_str}.zip"
     url = f"{base_url}{filename}"
 
     try:
-        response = requests.head(url, timeout=10, allow_redirects=True)
-        with logging_lock:
-            logging.debug(f"HEAD response for {url}: {response.status_code}")
+        response = session.head(url, timeout=10, allow_redirects=True)
+        logging.debug("HEAD response for %s: %s", url, response.status_code)
         if response.status_code == 200:
-            with logging_lock:
-                logging.info(f"Data available for {variable} at {resolution} ({time_step}) on {date_str}")
+            logging.info(f"Data available for {variable} at {resolution} ({time_step}) on {date_str}")
             return {'url': url, 'filename': filename, 'date': date_str}
+        if response.status_code in (404, 410):
+            # The file definitely does not exist; a GET would only say the same thing
+            logging.warning(f"Data unavailable for {variable} on {date_str} ({time_step}, {resolution}): HTTP {response.status_code}, skipping")
+            return None
+        logging.debug("HEAD returned %s for %s, falling back to GET", response.status_code, url)
     except requests.RequestException as e:
-        with logging_lock:
-            logging.debug(f"HEAD request failed for {url}: {e}, falling back to GET")
+        logging.debug("HEAD request failed for %s: %s, falling back to GET", url, e)
 
     try:
-        response = requests.get(url, stream=True, timeout=10, allow_redirects=True)
-        with logging_lock:
-            logging.debug(f"GET response for {url}: {response.status_code}")
+        response = session.get(url, stream=True, timeout=10, allow_redirects=True)
+        logging.debug("GET response for %s: %s", url, response.status_code)
+        response.close()  # Body is never read; hand the connection back to the pool
         if response.status_code == 200:
-            with logging_lock:
-                logging.info(f"Data available for {variable} at {resolution} ({time_step}) on {date_str}")
+            logging.info(f"Data available for {variable} at {resolution} ({time_step}) on {date_str}")
             return {'url': url, 'filename': filename, 'date': date_str}
         else:
-            with logging_lock:
-                logging.warning(f"Data unavailable for {variable} on {date_str} ({time_step}, {resolution}): HTTP {response.status_code}, skipping")
+            logging.warning(f"Data unavailable for {variable} on {date_str} ({time_step}, {resolution}): HTTP {response.status_code}, skipping")
             return None
     except requests.RequestException as e:
-        with logging_lock:
-            logging.warning(f"Data unavailable for {variable} on {date_str} ({time_step}, {resolution}): {e}, skipping")
+        logging.warning(f"Data unavailable for {variable} on {date_str} ({time_step}, {resolution}): {e}, skipping")
         return None
 
 class Downloader:
@@ -111,129 +159,112 @@ class Downloader:
         self.timeout = timeout
         self.workers = workers
         self.successful_downloads = 0
+        # One pooled session per downloader so TCP/TLS connections are reused across requests
+        self.session = make_session(max(1, workers))
+        # Parent directories already created by this downloader; a race only repeats a harmless mkdir
+        self._created_dirs = set()
 
-    def download_file(self, file_info: Dict, attempt: int = 1) -> Optional[str]:
+    def download_file(self, file_info: Dict) -> Optional[str]:
         url = file_info['url']
         output_path = file_info['output_path']
-        output_path.parent.mkdir(parents=True, exist_ok=True)
+        if output_path.parent not in self._created_dirs:
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+            self._created_dirs.add(output_path.parent)
 
         for attempt in range(1, self.retries + 1):
             try:
-                with logging_lock:
-                    logging.debug(f"Attempting to download {url} (Attempt {attempt}/{self.retries})")
-                response = requests.get(url, stream=True, timeout=self.timeout)
-                with logging_lock:
-                    logging.debug(f"HTTP response for {url}: {response.status_code}")
+                logging.debug("Attempting to download %s (Attempt %d/%d)", url, attempt, self.retries)
+                response = self.session.get(url, stream=True, timeout=self.timeout)
+                logging.debug("HTTP response for %s: %s", url, response.status_code)
                 response.raise_for_status()
 
                 expected_size = int(response.headers.get('Content-Length', 0))
-                with logging_lock:
-                    logging.debug(f"Expected file size for {url}: {expected_size} bytes")
+                logging.debug("Expected file size for %s: %d bytes", url, expected_size)
 
+                # Hash the stream as it is written instead of reading the file back afterwards;
+                # the checksum is only ever logged, so skip hashing when INFO is off
+                sha256_hash = hashlib.sha256() if logging.getLogger().isEnabledFor(logging.INFO) else None
                 downloaded_size = 0
                 with open(output_path, 'wb') as f:
-                    for chunk in response.iter_content(chunk_size=8192):
+                    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
                         if chunk:
                             f.write(chunk)
+                            if sha256_hash is not None:
+                                sha256_hash.update(chunk)
                             downloaded_size += len(chunk)
+                    # The ZIP is not read again soon: write it back, then let the kernel drop its
+                    # now-clean pages rather than evicting other processes' cache (Linux only).
+                    # Dirty pages are not dropped, hence the fdatasync first.
+                    if hasattr(os, 'posix_fadvise'):
+                        f.flush()
+                        try:
+                            os.fdatasync(f.fileno())
+                            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+                        except OSError:
+                            pass
 
                 if expected_size > 0 and downloaded_size != expected_size:
-                    with logging_lock:
-                        logging.error(f"File size mismatch for {output_path.name}: expected {expected_size} bytes, got {downloaded_size} bytes")
+                    logging.error(f"File size mismatch for {output_path.name}: expected {expected_size} bytes, got {downloaded_size} bytes")
                     return None
 
-                sha256_checksum = compute_sha256(output_path)
-                with logging_lock:
-                    logging.info(f"SHA256 checksum for {output_path.name}: {sha256_checksum}")
-                    logging.warning("Note: PRISM server does not provide checksums for verification. Compare manually if needed.")
-                    logging.info(f"Downloaded {output_path.name}")
-                with success_lock:
-                    self.successful_downloads += 1
+                if sha256_hash is not None:
+                    logging.info(f"SHA256 checksum for {output_path.name}: {sha256_hash.hexdigest()}")
+                logging.warning("Note: PRISM server does not provide checksums for verification. Compare manually if needed.")
+                logging.info(f"Downloaded {output_path.name}")
                 return str(output_path)
             except requests.RequestException as e:
-                with logging_lock:
-                    logging.warning(f"Download failed for {url} (Attempt {attempt}/{self.retries}): {e}")
+                logging.warning(f"Download failed for {url} (Attempt {attempt}/{self.retries}): {e}")
                 if attempt == self.retries:
-                    with logging_lock:
-                        logging.error(f"Failed to download {url} after {self.retries} attempts")
+                    logging.error(f"Failed to download {url} after {self.retries} attempts")
                     return None
+                time.sleep(self._retry_delay(e, attempt))
         return None
 
-    def download_all(self, files: List[Dict], stop_flag: callable = None) -> List[str]:
-        downloaded_files = []
-        total_files = len(files)
-        if total_files == 0:
-            with logging_lock:
-                logging.info("No files to download")
-            return []
-
-        progress_interval = max(1, total_files // 10)
-        completed = 0
-        next_threshold = progress_interval
-
-        with ThreadPoolExecutor(max_workers=self.workers) as executor:
-            future_to_file = {executor.submit(self.download_file, f): f for f in files}
-            for future in as_completed(future_to_file):
-                if stop_flag and stop_flag():
-                    with logging_lock:
-                        logging.info("PRISM download stopped by user")
-                    executor.shutdown(wait=False)
-                    return downloaded_files
-                try:
-                    path = future.result()
-                    if path:
-                        downloaded_files.append(path)
-                except Exception as e:
-                    with logging_lock:
-                        logging.error(f"Unexpected error in download task: {e}")
-                completed += 1
-                with logging_lock:
-                    if completed >= next_threshold:
-                        logging.info(f"Progress: {completed}/{total_files} files")
-                        next_threshold += progress_interval
-
-        with logging_lock:
-            logging.info(f"Final Progress: {completed}/{total_files} files")
-        return downloaded_files
-
-def validate_date(date_str: str, time_step: str) -> bool:
+    @staticmethod
+    def _retry_delay(error: requests.RequestException, attempt: int) -> float:
+        """Seconds to wait before retrying: the server's Retry-After on 429/503, else exponential backoff."""
+        response = getattr(error, 'response', None)
+        if response is not None and response.status_code in (429, 503):
+            retry_after = response.headers.get('Retry-After', '')
+            if retry_after.isdigit():
+                return min(MAX_RETRY_DELAY, int(retry_after))
+        return min(MAX_RETRY_DELAY, 0.5 * 2 ** (attempt - 1))
+
+# strptime format per time step, indexed by whether the date string contains dashes
+DATE_FORMATS = {
+    'daily': ('%Y%m%d', '%Y-%m-%d'),
+    'monthly': ('%Y%m', '%Y-%m'),
+}
+
+def parse_date(date_str: str, time_step: str) -> Optional[datetime]:
+    """Parse *date_str* for *time_step*, returning None (after logging why) if it is invalid."""
+    if time_step not in DATE_FORMATS:
+        logging.error(f"Invalid time_step: {time_step}. Must be 'daily' or 'monthly'.")
+        return None
     try:
-        if time_step == "daily":
-            try:
-                dt = datetime.strptime(date_str, '%Y-%m-%d')
-            except ValueError:
-                dt = datetime.strptime(date_str, '%Y%m%d')
-        elif time_step == "monthly":
-            try:
-                dt = datetime.strptime(date_str, '%Y-%m')
-            except ValueError:
-                dt = datetime.strptime(date_str, '%Y%m')
-        else:
-            with logging_lock:
-                logging.error(f"Invalid time_step: {time_step}. Must be 'daily' or 'monthly'.")
-            return False
+        # Pick the one format that can match instead of trying both and catching the failure
+        dt = datetime.strptime(date_str, DATE_FORMATS[time_step]['-' in date_str])
 
         if not (1 <= dt.month <= 12):
-            with logging_lock:
-                logging.error(f"Invalid month in {date_str}: {dt.month}. Must be 1–12.")
-            return False
+            logging.error(f"Invalid month in {date_str}: {dt.month}. Must be 1–12.")
+            return None
 
         min_year = 1981 if time_step == "daily" else 1895
         max_year = datetime.now().year
         if dt.year < min_year:
-            with logging_lock:
-                logging.error(f"Date {date_str} is too old for {time_step} data (starts {min_year}).")
-            return False
+            logging.error(f"Date {date_str} is too old for {time_step} data (starts {min_year}).")
+            return None
         if dt.year > max_year:
-            with logging_lock:
-                logging.error(f"Date {date_str} exceeds current year {max_year} for {time_step} data.")
-            return False
-        return True
+            logging.error(f"Date {date_str} exceeds current year {max_year} for {time_step} data.")
+            return None
+        return dt
     except ValueError as e:
-        with logging_lock:
-            expected_format = "YYYY-MM-DD or YYYYMMDD" if time_step == "daily" else "YYYY-MM or YYYYMM"
-            logging.error(f"Invalid date format: {date_str}. Expected {expected_format} for {time_step} data. Error: {e}")
-        return False
+        expected_format = "YYYY-MM-DD or YYYYMMDD" if time_step == "daily" else "YYYY-MM or YYYYMM"
+        logging.error(f"Invalid date format: {date_str}. Expected {expected_format} for {time_step} data. Error: {e}")
+        return None
+
+def validate_date(date_str: str, time_step: str) -> bool:
+    return parse_date(date_str, time_step) is not None
 
 def download_prism(
     variable: str,
@@ -252,8 +283,7 @@ def download_prism(
 ) -> bool:
     VALID_VARIABLES = ['ppt', 'tmax', 'tmin', 'tmean', 'tdmean', 'vpdmin', 'vpdmax']
     if variable not in VALID_VARIABLES:
-        with logging_lock:
-            logging.error(f"Invalid variable '{variable}', must be one of {', '.join(VALID_VARIABLES)}")
+        logging.error(f"Invalid variable '{variable}', must be one of {', '.join(VALID_VARIABLES)}")
         raise ValueError(f"Invalid variable: {variable}")
 
     metadata_prefix = "gridflow_prism_"
@@ -266,103 +296,158 @@ def download_prism(
         start_date = "2020-01"
         end_date = "2020-03"
         workers = 4
-        with logging_lock:
-            logging.info("Running in demo mode: downloading tmean for January–March 2020 (monthly, 4km)")
+        logging.info("Running in demo mode: downloading tmean for January–March 2020 (monthly, 4km)")
 
-    if not validate_date(start_date, time_step):
+    start_dt = parse_date(start_date, time_step)
+    if start_dt is None:
         raise ValueError(f"Invalid start date: {start_date}")
-    if not validate_date(end_date, time_step):
+    end_dt = parse_date(end_date, time_step)
+    if end_dt is None:
         raise ValueError(f"Invalid end date: {end_date}")
-
-    start_dt = datetime.strptime(start_date, '%Y-%m-%d' if '-' in start_date else '%Y%m%d') if time_step == 'daily' else \
-               datetime.strptime(start_date, '%Y-%m' if '-' in start_date else '%Y%m')
-    end_dt = datetime.strptime(end_date, '%Y-%m-%d' if '-' in end_date else '%Y%m%d') if time_step == 'daily' else \
-             datetime.strptime(end_date, '%Y-%m' if '-' in end_date else '%Y%m')
     if time_step == 'monthly':
         end_dt = end_dt + relativedelta(months=1) - timedelta(days=1)
 
     if start_dt > end_dt:
-        with logging_lock:
-            logging.error("start_date must be before or equal to end_date")
+        logging.error("start_date must be before or equal to end_date")
         raise ValueError("Start date must be before or equal to end date")
 
     # Generate list of dates to check
-    dates_to_check = []
-    current_dt = start_dt
-    while current_dt <= end_dt:
-        year = current_dt.year
-        date_str = current_dt.strftime('%Y%m%d' if time_step == 'daily' else '%Y%m')
-        dates_to_check.append((variable, resolution, time_step, year, date_str))
-        current_dt += timedelta(days=1) if time_step == 'daily' else relativedelta(months=1)
+    # Built from integer day/month offsets: no relativedelta arithmetic or strftime per date
+    if time_step == 'daily':
+        days = (start_dt + timedelta(days=i) for i in range((end_dt - start_dt).days + 1))
+        dates_to_check = [
+            (variable, resolution, time_step, d.year, f"{d.year:04d}{d.month:02d}{d.day:02d}")
+            for d in days
+        ]
+    else:
+        months = range(start_dt.year * 12 + start_dt.month - 1, end_dt.year * 12 + end_dt.month)
+        dates_to_check = [
+            (variable, resolution, time_step, m // 12, f"{m // 12:04d}{m % 12 + 1:02d}")
+            for m in months
+        ]
 
     # Initialize downloader and files list
     downloader = Downloader(file_manager, retries, timeout, workers or os.cpu_count() or 4)
-    files_to_download = []
     files_to_download_all = []
-    chunk_size = downloader.workers  # Chunk size equals number of workers
-
-    # Process dates in chunks
-    for i in range(0, len(dates_to_check), chunk_size):
-        chunk = dates_to_check[i:i + chunk_size]
-        chunk_files = []
-        existing_files = []
-
-        # Parallel availability checks for the chunk
-        with ThreadPoolExecutor(max_workers=chunk_size) as executor:
-            future_to_date = {
-                executor.submit(check_data_availability, *args): args
-                for args in chunk
-            }
-            for future in as_completed(future_to_date):
-                if stop_flag and stop_flag():
-                    with logging_lock:
-                        logging.info("PRISM availability check stopped by user")
-                    executor.shutdown(wait=False)
+    existing_count = 0
+    queued_count = 0
+
+    # Dates found available on a recent run skip the HEAD request. Only positive answers are
+    # cached: a missing date may be published later, and a failed check may be transient.
+    availability_cache = file_manager.load_availability_cache()
+    now = time.time()
+    cached_results = []
+    dates_to_query = []
+    for args in dates_to_check:
+        entry = availability_cache.get("/".join((variable, resolution, time_step, args[4])))
+        if entry and now - entry.get('checked', 0) < AVAILABILITY_CACHE_TTL:
+            cached_results.append({'url': entry['url'], 'filename': entry['filename'], 'date': args[4]})
+        else:
+            dates_to_query.append(args)
+    if cached_results:
+        logging.debug("Using cached availability for %d of %d dates", len(cached_results), len(dates_to_check))
+
+    def queue_file(result: Dict) -> bool:
+        """Record an available date and queue its download; False if the file already exists."""
+        nonlocal existing_count, queued_count
+        date_str = result['date']
+        output_path = file_manager.get_output_path(variable, resolution, date_str)
+        file_info = {'url': result['url'], 'output_path': output_path, 'date': date_str}
+        files_to_download_all.append(file_info)
+        if output_path.exists():
+            logging.info(f"File {output_path.name} already exists")
+            existing_count += 1
+            downloader.successful_downloads += 1
+            return False
+        pending_downloads.append(file_info)
+        queued_count += 1
+        return True
+
+    def finish_checks() -> None:
+        if dates_to_query:
+            file_manager.save_availability_cache(availability_cache)
+        if files_to_download_all:
+            logging.info(f"Found {len(files_to_download_all)} {time_step} files "
+                         f"({existing_count} existing, {queued_count} to download)")
+
+    # One pool for both phases. Cached dates are queued for download first; HEAD checks and
+    # downloads are each fed in through a window of 2*workers, so a download waits behind at
+    # most that many checks, and a stop request leaves little already-submitted work behind
+    window = 2 * downloader.workers
+    pending_checks = iter(dates_to_query)
+    pending_downloads = deque()
+    total_dates = len(dates_to_check)
+    progress_interval = max(1, total_dates // 10)
+    next_threshold = progress_interval
+    done_dates = 0  # Dates that were unavailable, already on disk, or finished downloading
+    checks = set()
+    downloads = set()
+    with ThreadPoolExecutor(max_workers=downloader.workers) as executor:
+        for result in cached_results:
+            if not queue_file(result):
+                done_dates += 1
+        checks.update(
+            executor.submit(check_data_availability, *args, session=downloader.session)
+            for args in itertools.islice(pending_checks, window)
+        )
+        while pending_downloads and len(downloads) < window:
+            downloads.add(executor.submit(downloader.download_file, pending_downloads.popleft()))
+        checking = bool(checks)
+        if not checking:
+            finish_checks()
+        while checks or downloads:
+            done, _ = wait(checks | downloads, return_when=FIRST_COMPLETED)
+            if stop_flag and stop_flag():
+                executor.shutdown(wait=False, cancel_futures=True)
+                if checking:
+                    logging.info("PRISM availability check stopped by user")
                     return False
-                try:
-                    result = future.result()
-                    if result:
-                        url = result['url']
-                        date_str = result['date']
-                        output_path = file_manager.get_output_path(variable, resolution, date_str)
-                        file_info = {'url': url, 'output_path': output_path, 'date': date_str}
-                        if output_path.exists():
-                            with logging_lock:
-                                logging.info(f"File {output_path.name} already exists")
-                            existing_files.append(file_info)
-                            with success_lock:
-                                downloader.successful_downloads += 1
-                        else:
-                            chunk_files.append(file_info)
-                        files_to_download_all.append(file_info)
-                except Exception as e:
-                    with logging_lock:
+                logging.info("PRISM download stopped by user")
+                break
+            for future in done:
+                if future in checks:
+                    checks.discard(future)
+                    try:
+                        result = future.result()
+                        if result:
+                            availability_cache["/".join((variable, resolution, time_step, result['date']))] = {
+                                'url': result['url'], 'filename': result['filename'], 'checked': now
+                            }
+                            if queue_file(result):
+                                continue
+                    except Exception as e:
                         logging.error(f"Error checking availability: {e}")
-
-        if chunk_files or existing_files:
-            with logging_lock:
-                logging.info(f"Found {len(chunk_files) + len(existing_files)} {time_step} files in chunk {i // chunk_size + 1} "
-                             f"({len(existing_files)} existing, {len(chunk_files)} to download)")
-            # Download files in parallel for this chunk
-            downloaded = downloader.download_all(chunk_files, stop_flag=stop_flag)
-            files_to_download.extend(downloaded)
-
-        if stop_flag and stop_flag():
-            with logging_lock:
-                logging.info("PRISM process stopped by user")
-            break
+                else:
+                    downloads.discard(future)
+                    try:
+                        if future.result():
+                            # Counted here on the collecting thread, so no lock is needed
+                            downloader.successful_downloads += 1
+                    except Exception as e:
+                        logging.error(f"Unexpected error in download task: {e}")
+                done_dates += 1
+            checks.update(
+                executor.submit(check_data_availability, *args, session=downloader.session)
+                for args in itertools.islice(pending_checks, window - len(checks))
+            )
+            while pending_downloads and len(downloads) < window:
+                downloads.add(executor.submit(downloader.download_file, pending_downloads.popleft()))
+            if checking and not checks:
+                checking = False
+                finish_checks()
+            if done_dates >= next_threshold:
+                logging.info(f"Progress: {done_dates}/{total_dates} files")
+                next_threshold = (done_dates // progress_interval + 1) * progress_interval
+        logging.info(f"Final Progress: {done_dates}/{total_dates} files")
 
     if not files_to_download_all:
-        with logging_lock:
-            logging.error("No PRISM files to download")
+        logging.error("No PRISM files to download")
         raise ValueError("No PRISM files available for download")
 
-    with logging_lock:
-        logging.info(f"Total found {len(files_to_download_all)} {time_step} files to download")
+    logging.info(f"Total found {len(files_to_download_all)} {time_step} files to download")
 
     # Save metadata for all files (existing and downloaded)
     file_manager.save_metadata(files_to_download_all, "query_results.json")
 
-    with logging_lock:
-        logging.info(f"Completed: {downloader.successful_downloads}/{len(files_to_download_all)} files processed successfully")
+    logging.info(f"Completed: {downloader.successful_downloads}/{len(files_to_download_all)} files processed successfully")
     return downloader.successful_downloads > 0
\ No newline at end of file
@@ -1,6 +1,7 @@
  
 import sys
 import argparse
+import multiprocessing
 
 def main():
     parser = argparse.ArgumentParser(prog='gridflow', description='GridFlow CLI and GUI for climate data processing')
@@ -16,4 +17,5 @@ def main():
         cli_main()
 
 if __name__ == '__main__':
+    multiprocessing.freeze_support()  # Crop workers re-launch the frozen executable on Windows
     main()
\ No newline at end of file
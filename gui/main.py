@@ -13,7 +13,8 @@ from pathlib import Path
 from threading import Event
 from functools import partial
 from os.path import expanduser
-from typing import Optional, Dict, Callable, Any
+from types import MappingProxyType
+from typing import Optional, Dict, Callable, Any, Mapping
 
 from PyQt5 import QtCore
 from PyQt5.QtWidgets import (
@@ -66,101 +67,44 @@ def mk_label(text: str, indent: int = 0, required: bool = False) -> QLabel:
 # --------------------------------------------------------------------------
 #  Modern theming helper – full replacement
 # --------------------------------------------------------------------------
-def apply_theme(
-    app: QApplication,
-    name: str = "default",
-    base_pt: int = 14,
-    small_pt: int = 12,
-    menubar_h_px: int = 30,
-) -> None:
-    """
-    Apply / re-apply a named colour theme and global font sizes.
+# Stylesheet rules that are the same for every theme and font size
+_STATIC_QSS = """
+    /* Large checkbox indicator */
+    QCheckBox#largeCheckbox::indicator {
+        width:24px;
+        height:24px;
+    }
 
-    Parameters
-    ----------
-    app            : QApplication
-    name           : str   ( default | cosmic | sand | ocean )
-    base_pt        : int   point size for all widgets except menus
-    small_pt       : int   point size for menus / status text
-    menubar_h_px   : int   minimum menubar height
-    """
-    # Set global font
-    app.setFont(QFont("Inter", base_pt))
+    /* Slim vertical scrollbar track */
+    QScrollBar:vertical {
+        width:12px;
+        margin:0;                     /* let handle span entire track */
+        background:transparent;
+    }
 
-    # Color palette per theme
-    name = name.lower()
+    /* hide and style the “up”/“down” sub-/add-buttons */
+    QScrollBar::sub-line:vertical,
+    QScrollBar::add-line:vertical {
+        height:12px;
+        background:transparent;
+        subcontrol-origin: margin;
+    }
+    QScrollBar::sub-line:vertical {
+        subcontrol-position: top;
+    }
+    QScrollBar::add-line:vertical {
+        subcontrol-position: bottom;
+    }
 
-    if name == "cosmic":                     # Cosmic Night
-        window_bg, base_bg = "#1a1b26", "#24283b"
-        border, accent     = "#414868", "#7aa2f7"
-        button_bg          = "#7aa2f7"
-        button_hover       = "#8eafff"
-        button_down        = "#628bf5"
-        text               = "#c0caf5"
-        card_bg            = "#2a2e48"
-        halo_bg            = "rgba(255,255,255,0.08)"
-        progress_bg        = "#3a3f5c"  # Lighter than #666
-        progress_text      = "#ffffff"  # White text
-        log_border         = "#414868"
-        log_bg             = "rgba(65,72,104,0.3)"
-
-    elif name == "sand":                     # Ashy Sands
-        window_bg, base_bg = "#c9c2a6", "#e8e5d7"
-        border, accent     = "#9e9982", "#a8a288"
-        button_bg          = "#969173"
-        button_hover       = "#a8a288"
-        button_down        = "#857f66"
-        text               = "#3c3a32"
-        card_bg            = "#e8e5d7"
-        halo_bg            = "rgba(168,162,136,0.17)"
-        progress_bg        = "#d5d2c1"  # Lighter than #666
-        progress_text      = "#ffffff"  # White text
-        log_border         = "#9e9982"
-        log_bg             = "rgba(158,153,130,0.2)"
-
-    elif name == "ocean":                    # Ocean Breeze
-        window_bg, base_bg = "#a3dffa", "#e6f7ff"
-        border, accent     = "#4a90e2", "#0077b6"
-        button_bg          = "#006494"
-        button_hover       = "#0a77b6"
-        button_down        = "#00517a"
-        text               = "#003087"
-        card_bg            = "#e6f7ff"
-        halo_bg            = "rgba(0,119,182,0.15)"
-        progress_bg        = "#c7e9ff"  # Lighter than #666
-        progress_text      = "#ffffff"  # White text
-        log_border         = "#4a90e2"
-        log_bg             = "rgba(74,144,226,0.15)"
-
-    else:                                    # Default light
-        window_bg, base_bg = "#f4f7fc", "#ffffff"
-        border, accent     = "#d1d9e6", "#4d90fe"
-        button_bg          = "#4d90fe"
-        button_hover       = "#6da8ff"
-        button_down        = "#3579e6"
-        text               = "#1a1a1a"
-        card_bg            = "#ffffff"
-        halo_bg            = "rgba(77,144,254,0.12)"
-        progress_bg        = "#d8dee9"  # Slightly darker than #e8ecef for contrast
-        progress_text      = "#1a1a1a"  # Dark text for visibility
-        log_border         = "#d1d9e6"
-        log_bg             = "rgba(209,217,230,0.15)"
-
-    # Qt palette
-    pal = QPalette()
-    pal.setColor(QPalette.Window,            QColor(window_bg))
-    pal.setColor(QPalette.WindowText,        QColor(text))
-    pal.setColor(QPalette.Base,              QColor(base_bg))
-    pal.setColor(QPalette.AlternateBase,     QColor(window_bg))
-    pal.setColor(QPalette.Text,              QColor(text))
-    pal.setColor(QPalette.Button,            QColor(button_bg))
-    pal.setColor(QPalette.ButtonText,        QColor("#ffffff"))
-    pal.setColor(QPalette.Highlight,         QColor(accent))
-    pal.setColor(QPalette.HighlightedText,   QColor("#ffffff"))
-    app.setPalette(pal)
+    /* no extra coloring on the “page” areas */
+    QScrollBar::sub-page:vertical,
+    QScrollBar::add-page:vertical {
+        background:transparent;
+    }
+"""
 
-    # Style-sheet
-    app.setStyleSheet(f"""
+# Theme- and size-dependent rules; filled in by _build_qss and appended after _STATIC_QSS
+_DYNAMIC_QSS_TEMPLATE = """
     /* Menubar */
     QMenuBar {{
         background:{border};
@@ -279,11 +223,7 @@ def apply_theme(
 
     /* Custom style for large checkboxes */
     QCheckBox#largeCheckbox {{
-        font-size:{base_pt + 2}pt;
-    }}
-    QCheckBox#largeCheckbox::indicator {{
-        width:24px;
-        height:24px;
+        font-size:{large_pt}pt;
     }}
     QCheckBox#largeCheckbox::indicator:unchecked {{
         border:2px solid {border};
@@ -293,43 +233,152 @@ def apply_theme(
         border:2px solid {accent};
         background:{accent};
     }}
+
     /* Slim, themed vertical scrollbar */
-    QScrollBar:vertical {{
-        width:12px;
-        margin:0;                     /* let handle span entire track */
-        background:transparent;
-    }}
     QScrollBar::handle:vertical {{
         border-radius:6px;
         background:{accent};
         min-height:24px;              /* ensure it can’t shrink into the arrow areas */
     }}
-
-    /* hide and style the “up”/“down” sub-/add-buttons */
-    QScrollBar::sub-line:vertical,
-    QScrollBar::add-line:vertical {{
-        height:12px;
-        background:transparent;
-        subcontrol-origin: margin;
-    }}
-    QScrollBar::sub-line:vertical {{
-        subcontrol-position: top;
-    }}
-    QScrollBar::add-line:vertical {{
-        subcontrol-position: bottom;
-    }}
     QScrollBar::sub-line:vertical:hover,
     QScrollBar::add-line:vertical:hover {{
         background:{halo_bg};         /* subtle hover feedback */
     }}
 
-    /* no extra coloring on the “page” areas */
-    QScrollBar::sub-page:vertical,
-    QScrollBar::add-page:vertical {{
-        background:transparent;
-    }}
+    """
+
+# Colour palettes by theme name, built once; unknown names fall back to "default"
+_THEMES: Dict[str, Mapping[str, str]] = {
+    "default": MappingProxyType({  # Default light
+        "window_bg":     "#f4f7fc",
+        "base_bg":       "#ffffff",
+        "border":        "#d1d9e6",
+        "accent":        "#4d90fe",
+        "button_bg":     "#4d90fe",
+        "button_hover":  "#6da8ff",
+        "button_down":   "#3579e6",
+        "text":          "#1a1a1a",
+        "card_bg":       "#ffffff",
+        "halo_bg":       "rgba(77,144,254,0.12)",
+        "progress_bg":   "#d8dee9",               # Slightly darker than #e8ecef for contrast
+        "progress_text": "#1a1a1a",               # Dark text for visibility
+        "log_border":    "#d1d9e6",
+        "log_bg":        "rgba(209,217,230,0.15)",
+    }),
+    "cosmic": MappingProxyType({  # Cosmic Night
+        "window_bg":     "#1a1b26",
+        "base_bg":       "#24283b",
+        "border":        "#414868",
+        "accent":        "#7aa2f7",
+        "button_bg":     "#7aa2f7",
+        "button_hover":  "#8eafff",
+        "button_down":   "#628bf5",
+        "text":          "#c0caf5",
+        "card_bg":       "#2a2e48",
+        "halo_bg":       "rgba(255,255,255,0.08)",
+        "progress_bg":   "#3a3f5c",               # Lighter than #666
+        "progress_text": "#ffffff",               # White text
+        "log_border":    "#414868",
+        "log_bg":        "rgba(65,72,104,0.3)",
+    }),
+    "sand": MappingProxyType({  # Ashy Sands
+        "window_bg":     "#c9c2a6",
+        "base_bg":       "#e8e5d7",
+        "border":        "#9e9982",
+        "accent":        "#a8a288",
+        "button_bg":     "#969173",
+        "button_hover":  "#a8a288",
+        "button_down":   "#857f66",
+        "text":          "#3c3a32",
+        "card_bg":       "#e8e5d7",
+        "halo_bg":       "rgba(168,162,136,0.17)",
+        "progress_bg":   "#d5d2c1",               # Lighter than #666
+        "progress_text": "#ffffff",               # White text
+        "log_border":    "#9e9982",
+        "log_bg":        "rgba(158,153,130,0.2)",
+    }),
+    "ocean": MappingProxyType({  # Ocean Breeze
+        "window_bg":     "#a3dffa",
+        "base_bg":       "#e6f7ff",
+        "border":        "#4a90e2",
+        "accent":        "#0077b6",
+        "button_bg":     "#006494",
+        "button_hover":  "#0a77b6",
+        "button_down":   "#00517a",
+        "text":          "#003087",
+        "card_bg":       "#e6f7ff",
+        "halo_bg":       "rgba(0,119,182,0.15)",
+        "progress_bg":   "#c7e9ff",               # Lighter than #666
+        "progress_text": "#ffffff",               # White text
+        "log_border":    "#4a90e2",
+        "log_bg":        "rgba(74,144,226,0.15)",
+    }),
+}
+
+# Formatted stylesheets keyed by (theme, base_pt, small_pt, menubar_h_px), and the one applied last
+_QSS_CACHE: Dict[tuple, str] = {}
+_LAST_QSS: Optional[str] = None
+
+def _build_qss(colors: Mapping[str, str], base_pt: int, small_pt: int, menubar_h_px: int) -> str:
+    """Return the application stylesheet for one colour theme and set of font sizes."""
+    return _STATIC_QSS + _DYNAMIC_QSS_TEMPLATE.format(
+        base_pt=base_pt,
+        large_pt=base_pt + 2,
+        small_pt=small_pt,
+        menubar_h_px=menubar_h_px,
+        **colors,
+    )
+
+def apply_theme(
+    app: QApplication,
+    name: str = "default",
+    base_pt: int = 14,
+    small_pt: int = 12,
+    menubar_h_px: int = 30,
+) -> None:
+    """
+    Apply / re-apply a named colour theme and global font sizes.
+
+    Parameters
+    ----------
+    app            : QApplication
+    name           : str   ( default | cosmic | sand | ocean )
+    base_pt        : int   point size for all widgets except menus
+    small_pt       : int   point size for menus / status text
+    menubar_h_px   : int   minimum menubar height
+    """
+    global _LAST_QSS
+    name = name.lower()
+    if name not in _THEMES:
+        name = "default"
+    key = (name, base_pt, small_pt, menubar_h_px)
+    qss = _QSS_CACHE.get(key)
+    if qss is not None and qss is _LAST_QSS:
+        return  # Same theme and sizes as already applied: font, palette and sheet are unchanged
+
+    # Set global font
+    app.setFont(QFont("Inter", base_pt))
+
+    # Color palette for the theme, then the Qt palette
+    theme = _THEMES[name]
+    pal = QPalette()
+    pal.setColor(QPalette.Window,            QColor(theme["window_bg"]))
+    pal.setColor(QPalette.WindowText,        QColor(theme["text"]))
+    pal.setColor(QPalette.Base,              QColor(theme["base_bg"]))
+    pal.setColor(QPalette.AlternateBase,     QColor(theme["window_bg"]))
+    pal.setColor(QPalette.Text,              QColor(theme["text"]))
+    pal.setColor(QPalette.Button,            QColor(theme["button_bg"]))
+    pal.setColor(QPalette.ButtonText,        QColor("#ffffff"))
+    pal.setColor(QPalette.Highlight,         QColor(theme["accent"]))
+    pal.setColor(QPalette.HighlightedText,   QColor("#ffffff"))
+    app.setPalette(pal)
 
-    """)
+    # Style-sheet: formatted once per (theme, sizes) and only re-applied when it changes,
+    # since every setStyleSheet makes Qt re-parse the sheet and re-polish all widgets
+    if qss is None:
+        qss = _QSS_CACHE[key] = _build_qss(theme, base_pt, small_pt, menubar_h_px)
+    app.setStyleSheet(qss)
+    _LAST_QSS = qss
 
 # --------------------------- constants ---------------------------
 LOGO_SIZE = (350, 150)
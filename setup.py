@@ -53,6 +53,10 @@ setup(
             "pytest>=8.3.2",
             "pytest-cov>=5.0.0",
         ],
+        "fast": [
+            "orjson>=3.8.0",
+            "h5py>=3.0",
+        ],
     },
     python_requires=">=3.8",
     classifiers=[
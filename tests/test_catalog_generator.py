@@ -0,0 +1,121 @@
+import json
+import logging
+import os
+import netCDF4
+import pytest
+from unittest.mock import patch
+from gridflow import catalog_generator
+from gridflow.catalog_generator import METADATA_CACHE_FILENAME, METADATA_KEYS, generate_catalog
+
+# Fixture to reset logging before each test
+@pytest.fixture(autouse=True)
+def reset_logging():
+    logger = logging.getLogger()
+    logger.handlers = []
+    logger.setLevel(logging.NOTSET)
+    yield
+    logger.handlers = []
+
+ATTRS = {
+    "activity_id": "ScenarioMIP",
+    "source_id": "CMCC-ESM2",
+    "variant_label": "r1i1p1f1",
+    "institution_id": "CMCC",
+}
+
+def make_file(path, variable_id, vlen=False, **overrides):
+    """Write an empty NetCDF4 file carrying the catalog's global attributes."""
+    with netCDF4.Dataset(path, "w") as ds:
+        for key, value in {**ATTRS, "variable_id": variable_id, **overrides}.items():
+            if vlen:
+                ds.setncattr_string(key, value)
+            else:
+                ds.setncattr(key, value)
+    return path
+
+@pytest.fixture
+def catalog_dirs(tmp_path):
+    input_dir, output_dir = tmp_path / "data", tmp_path / "catalog"
+    input_dir.mkdir()
+    make_file(input_dir / "tas_a.nc", "tas")
+    make_file(input_dir / "pr_a.nc", "pr")
+    return input_dir, output_dir
+
+def run(input_dir, output_dir):
+    """Generate the catalog, returning it with the paths whose metadata had to be read."""
+    read = []
+    real = catalog_generator.extract_metadata
+    def extract(file_path):
+        read.append(os.path.basename(file_path))
+        return real(file_path)
+    with patch.object(catalog_generator, "extract_metadata", side_effect=extract):
+        catalog = generate_catalog(str(input_dir), str(output_dir), workers=2)
+    return catalog, sorted(read)
+
+def test_generate_catalog_serves_unchanged_files_from_cache(catalog_dirs):
+    input_dir, output_dir = catalog_dirs
+    first, read = run(input_dir, output_dir)
+    assert read == ["pr_a.nc", "tas_a.nc"]
+    cache = json.loads((output_dir / METADATA_CACHE_FILENAME).read_text())
+    assert sorted(os.path.basename(p) for p in cache) == ["pr_a.nc", "tas_a.nc"]
+    second, read = run(input_dir, output_dir)
+    assert read == []
+    assert second == first
+
+def test_generate_catalog_rereads_file_with_new_mtime(catalog_dirs):
+    input_dir, output_dir = catalog_dirs
+    run(input_dir, output_dir)
+    st = (input_dir / "tas_a.nc").stat()
+    os.utime(input_dir / "tas_a.nc", ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    _, read = run(input_dir, output_dir)
+    assert read == ["tas_a.nc"]
+
+def test_generate_catalog_rereads_file_with_new_size(catalog_dirs):
+    input_dir, output_dir = catalog_dirs
+    run(input_dir, output_dir)
+    cache_path = output_dir / METADATA_CACHE_FILENAME
+    cache = json.loads(cache_path.read_text())
+    # Same mtime, different size: the entry must not be trusted
+    tas_path = str(input_dir / "tas_a.nc")
+    cache[tas_path]["size"] += 1
+    cache_path.write_text(json.dumps(cache))
+    catalog, read = run(input_dir, output_dir)
+    assert read == ["tas_a.nc"]
+    assert catalog["ScenarioMIP:CMCC-ESM2:r1i1p1f1"]["variables"]["tas"]["file_count"] == 1
+    assert json.loads(cache_path.read_text())[tas_path]["size"] == os.path.getsize(tas_path)
+
+def test_generate_catalog_prunes_deleted_files_from_cache(catalog_dirs):
+    input_dir, output_dir = catalog_dirs
+    run(input_dir, output_dir)
+    (input_dir / "pr_a.nc").unlink()
+    catalog, read = run(input_dir, output_dir)
+    assert read == []
+    assert list(catalog["ScenarioMIP:CMCC-ESM2:r1i1p1f1"]["variables"]) == ["tas"]
+    cache = json.loads((output_dir / METADATA_CACHE_FILENAME).read_text())
+    assert [os.path.basename(p) for p in cache] == ["tas_a.nc"]
+
+def read_with_netcdf4(path):
+    with netCDF4.Dataset(path) as ds:
+        return {key: getattr(ds, key, "") for key in METADATA_KEYS}
+
+@pytest.mark.parametrize("vlen", [False, True], ids=["fixed-length", "variable-length"])
+def test_hdf5_reader_matches_netcdf4(tmp_path, vlen):
+    pytest.importorskip("h5py")
+    path = make_file(tmp_path / "tas.nc", "tas", vlen=vlen, institution_id="Centro Euro-Mediterraneo sui Cambiamenti Climatici – CMCC")
+    metadata = catalog_generator._read_global_attrs_hdf5(path)
+    assert metadata == read_with_netcdf4(path)
+    assert all(type(value) is str for value in metadata.values())
+
+def test_hdf5_reader_matches_netcdf4_for_missing_attribute(tmp_path):
+    pytest.importorskip("h5py")
+    path = tmp_path / "tas.nc"
+    with netCDF4.Dataset(path, "w") as ds:
+        ds.activity_id = "CMIP"
+    assert catalog_generator._read_global_attrs_hdf5(path) == read_with_netcdf4(path)
+
+def test_hdf5_reader_declines_classic_files(tmp_path):
+    path = tmp_path / "tas.nc"
+    with netCDF4.Dataset(path, "w", format="NETCDF3_CLASSIC") as ds:
+        ds.activity_id = "CMIP"
+    assert catalog_generator._read_global_attrs_hdf5(path) is None
+    assert catalog_generator.extract_metadata(str(path))["metadata"] == read_with_netcdf4(path)
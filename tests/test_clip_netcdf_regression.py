@@ -0,0 +1,78 @@
+import logging
+import numpy as np
+import netCDF4 as nc
+import pytest
+import geopandas as gpd
+from shapely.geometry import box
+from gridflow.clip_netcdf import clip_netcdf
+
+# Fixture to reset logging before each test
+@pytest.fixture(autouse=True)
+def reset_logging():
+    logger = logging.getLogger()
+    logger.handlers = []
+    logger.setLevel(logging.NOTSET)
+    yield
+    logger.handlers = []
+
+@pytest.fixture
+def shapefile(tmp_path):
+    path = tmp_path / "box.shp"
+    gpd.GeoDataFrame(geometry=[box(-100.0, 30.0, -90.0, 40.0)], crs="EPSG:4326").to_file(path)
+    return path
+
+def make_file(path, nt=2):
+    """Write a small time x lat x lon file on a 0-360 grid with a 'tas' field."""
+    lat, lon = np.arange(-89.0, 90.0, 2.0), np.arange(0.0, 360.0, 2.0)
+    with nc.Dataset(path, 'w') as ds:
+        ds.createDimension('time', None)
+        ds.createDimension('lat', len(lat))
+        ds.createDimension('lon', len(lon))
+        ds.createVariable('time', 'f8', ('time',))[:] = np.arange(nt)
+        ds.createVariable('lat', 'f8', ('lat',))[:] = lat
+        ds.createVariable('lon', 'f8', ('lon',))[:] = lon
+        tas = ds.createVariable('tas', 'f4', ('time', 'lat', 'lon'), fill_value=1e20)
+        tas[:] = np.arange(nt * len(lat) * len(lon)).reshape(nt, len(lat), len(lon)).astype('f4')
+    return lat, np.where(lon > 180, lon - 360, lon)
+
+def test_clip_netcdf_clips_every_file_in_worker_processes(tmp_path, shapefile):
+    in_dir, out_dir = tmp_path / "in", tmp_path / "out"
+    in_dir.mkdir()
+    for name in ("a.nc", "b.nc", "c.nc"):
+        lat, lon = make_file(in_dir / name)
+    assert clip_netcdf(str(in_dir), str(shapefile), str(out_dir), workers=2)
+    inside = np.outer((lat > 30) & (lat < 40), (lon > -100) & (lon < -90))
+    for name in ("a", "b", "c"):
+        with nc.Dataset(out_dir / f"{name}_clipped.nc") as ds:
+            ds.set_auto_maskandscale(False)
+            tas = ds.variables['tas'][:]
+        with nc.Dataset(in_dir / f"{name}.nc") as ds:
+            src = ds.variables['tas'][:]
+        np.testing.assert_array_equal(tas[:, inside], src[:, inside])
+        assert (tas[:, ~inside] == np.float32(1e20)).all()
+
+def test_clip_packed_int16_keeps_raw_values_and_fill(tmp_path, shapefile):
+    in_dir, out_dir = tmp_path / "in", tmp_path / "out"
+    in_dir.mkdir()
+    lat, lon = make_file(in_dir / "a.nc")
+    with nc.Dataset(in_dir / "a.nc", 'a') as ds:
+        packed = ds.createVariable('pr', 'i2', ('time', 'lat', 'lon'), fill_value=np.int16(-32767))
+        packed.scale_factor = 0.01
+        packed.add_offset = 250.0
+        packed.set_auto_maskandscale(False)
+        packed[:] = (np.arange(packed.size).reshape(packed.shape) % 30000).astype('i2')
+    assert clip_netcdf(str(in_dir), str(shapefile), str(out_dir), workers=1)
+    inside = np.outer((lat > 30) & (lat < 40), (lon > -100) & (lon < -90))
+    with nc.Dataset(out_dir / "a_clipped.nc") as ds:
+        ds.set_auto_maskandscale(False)
+        out = ds.variables['pr']
+        assert out.dtype == np.int16
+        assert out.scale_factor == pytest.approx(0.01)
+        assert out.add_offset == pytest.approx(250.0)
+        raw = out[:]
+    with nc.Dataset(in_dir / "a.nc") as ds:
+        ds.set_auto_maskandscale(False)
+        src = ds.variables['pr'][:]
+    np.testing.assert_array_equal(raw[:, inside], src[:, inside])
+    # Outside the shape the raw fill value is written, not 0 (which would read back as add_offset)
+    assert (raw[:, ~inside] == -32767).all()
@@ -1,4 +1,5 @@
 import logging
+import os
 import json
 import pytest
 import requests
@@ -73,6 +74,14 @@ def test_file_manager_get_output_path_structured(sample_output_dir, sample_metad
     expected = sample_output_dir / "tas" / "100km" / "ScenarioMIP" / "tas_Amon_CMCC-ESM2_ssp585_r1i1p1f1_gn_201501-210012.nc"
     assert output_path == expected
 
+def test_file_manager_get_output_path_structured_cached(sample_output_dir, sample_metadata_dir, file_info):
+    file_manager = FileManager(str(sample_output_dir), str(sample_metadata_dir), "structured")
+    first = file_manager.get_output_path(file_info)
+    with patch("pathlib.Path.mkdir") as mock_mkdir:
+        second = file_manager.get_output_path({**file_info, "title": "pr.nc"})
+        mock_mkdir.assert_not_called()
+    assert second == first.parent / "pr.nc"
+
 def test_file_manager_get_output_path_resolution_fallback(sample_output_dir, sample_metadata_dir, file_info):
     file_info_modified = file_info.copy()
     file_info_modified["nominal_resolution"] = [""]
@@ -127,13 +136,26 @@ def test_query_handler_fetch_datasets_success(file_info, stop_event):
         }
     }
     with patch.object(query_handler.session, "get") as mock_get:
-        mock_get.return_value = MagicMock(status_code=200, json=lambda: mock_response)
+        mock_get.return_value = MagicMock(status_code=200, content=json.dumps(mock_response).encode())
         files = query_handler.fetch_datasets(params, timeout=10)
         assert len(files) == 2
         assert files[0]["id"] == "file1"
         assert files[1]["id"] == "file2"
         mock_get.assert_called()
 
+def test_query_handler_fetch_datasets_duplicate_titles(file_info, stop_event):
+    query_handler = QueryHandler(nodes=["https://example.com/search"], stop_event=stop_event)
+    mock_response = {
+        "response": {
+            "docs": [file_info, {**file_info, "id": "file1_replica"}, {**file_info, "id": "file2", "title": "pr.nc"}],
+            "numFound": 3
+        }
+    }
+    with patch.object(query_handler.session, "get") as mock_get:
+        mock_get.return_value = MagicMock(status_code=200, content=json.dumps(mock_response).encode())
+        files = query_handler.fetch_datasets({"project": "CMIP6"}, timeout=10)
+        assert [f["id"] for f in files] == ["file1", "file2"]
+
 def test_query_handler_fetch_datasets_pagination(file_info, stop_event):
     query_handler = QueryHandler(nodes=["https://example.com/search"], stop_event=stop_event)
     params = {"project": "CMIP6"}
@@ -143,8 +165,8 @@ def test_query_handler_fetch_datasets_pagination(file_info, stop_event):
     ]
     with patch.object(query_handler.session, "get") as mock_get:
         mock_get.side_effect = [
-            MagicMock(status_code=200, json=lambda: mock_responses[0]),
-            MagicMock(status_code=200, json=lambda: mock_responses[1])
+            MagicMock(status_code=200, content=json.dumps(mock_responses[0]).encode()),
+            MagicMock(status_code=200, content=json.dumps(mock_responses[1]).encode())
         ]
         files = query_handler.fetch_datasets(params, timeout=10)
         assert len(files) == 2
@@ -157,7 +179,7 @@ def test_query_handler_fetch_datasets_empty_response(stop_event, caplog):
     params = {"project": "CMIP6"}
     mock_response = {"response": {"docs": [], "numFound": 0}}
     with patch.object(query_handler.session, "get") as mock_get:
-        mock_get.return_value = MagicMock(status_code=200, json=lambda: mock_response)
+        mock_get.return_value = MagicMock(status_code=200, content=json.dumps(mock_response).encode())
         with caplog.at_level(logging.ERROR):
             with pytest.raises(SystemExit):
                 query_handler.fetch_datasets(params, timeout=10)
@@ -179,7 +201,7 @@ def test_query_handler_fetch_datasets_multiple_nodes(file_info, stop_event):
     params = {"project": "CMIP6"}
     mock_response = {"response": {"docs": [file_info], "numFound": 1}}
     with patch.object(query_handler.session, "get") as mock_get:
-        mock_get.return_value = MagicMock(status_code=200, json=lambda: mock_response)
+        mock_get.return_value = MagicMock(status_code=200, content=json.dumps(mock_response).encode())
         files = query_handler.fetch_datasets(params, timeout=10)
         assert len(files) == 1
         assert files[0]["id"] == "file1"
@@ -189,7 +211,7 @@ def test_query_handler_fetch_specific_file(file_info, stop_event):
     query_handler = QueryHandler(nodes=["https://example.com/search"], stop_event=stop_event)
     mock_response = {"response": {"docs": [file_info], "numFound": 1}}
     with patch.object(query_handler.session, "get") as mock_get:
-        mock_get.return_value = MagicMock(status_code=200, json=lambda: mock_response)
+        mock_get.return_value = MagicMock(status_code=200, content=json.dumps(mock_response).encode())
         result = query_handler.fetch_specific_file(file_info, timeout=10)
         assert result == file_info
         mock_get.assert_called()
@@ -198,7 +220,7 @@ def test_query_handler_fetch_specific_file_not_found(file_info, stop_event, capl
     query_handler = QueryHandler(nodes=["https://example.com/search"], stop_event=stop_event)
     mock_response = {"response": {"docs": [], "numFound": 0}}
     with patch.object(query_handler.session, "get") as mock_get:
-        mock_get.return_value = MagicMock(status_code=200, json=lambda: mock_response)
+        mock_get.return_value = MagicMock(status_code=200, content=json.dumps(mock_response).encode())
         with caplog.at_level(logging.ERROR):
             result = query_handler.fetch_specific_file(file_info, timeout=10)
             assert result is None
@@ -210,18 +232,48 @@ def test_interruptible_session_stop_event(stop_event):
     with pytest.raises(requests.exceptions.RequestException, match="Download interrupted by user"):
         session.get("http://example.com/tas.nc")
 
+def test_interruptible_session_socket_options(stop_event):
+    import socket
+    session = InterruptibleSession(stop_event)
+    options = session.get_adapter("https://example.com").poolmanager.connection_pool_kw["socket_options"]
+    assert (socket.IPPROTO_TCP, socket.TCP_NODELAY, 1) in options
+    assert (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1) in options
+    assert not any(option[1] == socket.SO_RCVBUF for option in options)
+
 def test_downloader_init_authentication(file_info, sample_output_dir, sample_metadata_dir, caplog):
     file_manager = FileManager(str(sample_output_dir), str(sample_metadata_dir), "flat")
     with caplog.at_level(logging.WARNING):
         downloader = Downloader(file_manager, max_workers=1, retries=1, timeout=10, max_downloads=None, username="user", password="pass", verify_ssl=True)
-        assert downloader.session.auth == ("user", "pass")
+        assert downloader.auth == ("user", "pass")
+        assert downloader.session.auth is None
         assert "Using basic authentication" in caplog.text
     caplog.clear()
     with caplog.at_level(logging.WARNING):
         downloader = Downloader(file_manager, max_workers=1, retries=1, timeout=10, max_downloads=None, username=None, password=None, verify_ssl=True)
-        assert downloader.session.auth is None
+        assert downloader.auth is None
         assert "No authentication credentials provided" in caplog.text
 
+def test_downloader_shares_session_with_query_handler(sample_output_dir):
+    file_manager = FileManager(str(sample_output_dir), str(sample_output_dir), "flat")
+    downloader = Downloader(file_manager, max_workers=1, retries=1, timeout=10, max_downloads=None, username=None, password=None, verify_ssl=True)
+    assert downloader.query_handler.session is downloader.session
+
+def test_downloader_sends_credentials_to_data_nodes_only(sample_output_dir, file_info):
+    file_manager = FileManager(str(sample_output_dir), str(sample_output_dir), "flat")
+    downloader = Downloader(file_manager, max_workers=1, retries=1, timeout=10, max_downloads=None, username="user", password="pass", verify_ssl=True)
+    downloader.query_handler.nodes = ["https://search.example.com/esg-search/search"]
+    sent = []
+    def send(request, **kwargs):
+        sent.append(request)
+        raise requests.ConnectionError("offline")
+    with patch("requests.adapters.HTTPAdapter.send", side_effect=send):
+        assert downloader.query_handler.fetch_specific_file(file_info, 10) is None
+        with pytest.raises(requests.ConnectionError):
+            downloader._download_range("https://data.example.com/tas.nc", sample_output_dir / "tas.nc", 0, 9)
+    search, data = sent
+    assert "Authorization" not in search.headers
+    assert data.headers["Authorization"].startswith("Basic ")
+
 def test_downloader_verify_checksum_sha256(sample_output_dir, file_info):
     file_manager = FileManager(str(sample_output_dir), str(sample_output_dir), "flat")
     downloader = Downloader(file_manager, max_workers=1, retries=1, timeout=10, max_downloads=None, username=None, password=None, verify_ssl=True)
@@ -275,6 +327,59 @@ def test_downloader_download_file_success(sample_output_dir, file_info, stop_eve
         assert failed_info is None
         assert output_path.exists()
 
+def test_downloader_download_file_hashes_while_streaming(sample_output_dir, file_info):
+    file_manager = FileManager(str(sample_output_dir), str(sample_output_dir), "flat")
+    downloader = Downloader(file_manager, max_workers=1, retries=1, timeout=10, max_downloads=None, username=None, password=None, verify_ssl=True)
+    output_path = sample_output_dir / "ScenarioMIP_100km_tas_Amon_CMCC-ESM2_ssp585_r1i1p1f1_gn_201501-210012.nc"
+    with patch.object(downloader.session, "get") as mock_get, \
+         patch.object(downloader, "verify_checksum") as mock_verify:
+        mock_get.return_value = MagicMock(status_code=200, iter_content=lambda chunk_size: [b"test_", b"data"])
+        path, failed_info = downloader.download_file(file_info)
+        mock_verify.assert_not_called()
+    assert path == str(output_path)
+    assert failed_info is None
+    assert output_path.read_bytes() == b"test_data"
+
+def test_downloader_download_file_ranges(sample_output_dir, file_info):
+    file_manager = FileManager(str(sample_output_dir), str(sample_output_dir), "flat")
+    downloader = Downloader(file_manager, max_workers=1, retries=1, timeout=10, max_downloads=None, username=None, password=None, verify_ssl=True, parts=2)
+    downloader.RANGE_THRESHOLD = 1
+    payload = b"test_data"
+    file_info["size"] = len(payload)
+    output_path = sample_output_dir / "ScenarioMIP_100km_tas_Amon_CMCC-ESM2_ssp585_r1i1p1f1_gn_201501-210012.nc"
+
+    def ranged_get(url, **kwargs):
+        start, end = map(int, kwargs["headers"]["Range"][len("bytes="):].split("-"))
+        return MagicMock(status_code=206, iter_content=lambda chunk_size: [payload[start:end + 1]])
+
+    head = MagicMock(status_code=200, headers={"Accept-Ranges": "bytes", "Content-Length": str(len(payload))})
+    with patch.object(downloader.session, "head", return_value=head), \
+         patch.object(downloader.session, "get", side_effect=ranged_get) as mock_get:
+        path, failed_info = downloader.download_file(file_info)
+        assert path == str(output_path)
+        assert failed_info is None
+        assert output_path.read_bytes() == payload
+        assert mock_get.call_count == 2
+
+def test_downloader_download_file_short_range_fails(sample_output_dir, file_info):
+    file_manager = FileManager(str(sample_output_dir), str(sample_output_dir), "flat")
+    downloader = Downloader(file_manager, max_workers=1, retries=0, timeout=10, max_downloads=None, username=None, password=None, verify_ssl=True, parts=2)
+    downloader.RANGE_THRESHOLD = 1
+    payload = b"test_data"
+    file_info["size"] = len(payload)
+    file_info["checksum"] = [""]
+
+    def truncated_get(url, **kwargs):
+        start, end = map(int, kwargs["headers"]["Range"][len("bytes="):].split("-"))
+        return MagicMock(status_code=206, iter_content=lambda chunk_size: [payload[start:end]])
+
+    head = MagicMock(status_code=200, headers={"Accept-Ranges": "bytes", "Content-Length": str(len(payload))})
+    with patch.object(downloader.session, "head", return_value=head), \
+         patch.object(downloader.session, "get", side_effect=truncated_get):
+        path, failed_info = downloader.download_file(file_info)
+    assert path is None
+    assert failed_info == file_info
+
 def test_downloader_download_file_existing_valid(sample_output_dir, file_info, stop_event, caplog):
     file_manager = FileManager(str(sample_output_dir), str(sample_output_dir), "flat")
     downloader = Downloader(file_manager, max_workers=1, retries=1, timeout=10, max_downloads=None, username=None, password=None, verify_ssl=True)
@@ -287,6 +392,54 @@ def test_downloader_download_file_existing_valid(sample_output_dir, file_info, s
         assert failed_info is None
         assert "already exists" in caplog.text
 
+def test_downloader_download_file_existing_sidecar_skips_hash(sample_output_dir, file_info):
+    file_manager = FileManager(str(sample_output_dir), str(sample_output_dir), "flat")
+    downloader = Downloader(file_manager, max_workers=1, retries=1, timeout=10, max_downloads=None, username=None, password=None, verify_ssl=True)
+    output_path = sample_output_dir / "ScenarioMIP_100km_tas_Amon_CMCC-ESM2_ssp585_r1i1p1f1_gn_201501-210012.nc"
+    output_path.write_bytes(b"test_data")
+    file_info["size"] = len(b"test_data")
+    st = output_path.stat()
+    (sample_output_dir / (output_path.name + ".checksum")).write_text(f"{file_info['checksum'][0]} {st.st_size} {st.st_mtime_ns}")
+    with patch.object(downloader, "verify_checksum") as mock_verify:
+        path, failed_info = downloader.download_file(file_info)
+        mock_verify.assert_not_called()
+    assert path == str(output_path)
+    assert failed_info is None
+
+def test_downloader_download_file_stale_sidecar_rehashes(sample_output_dir, file_info):
+    file_manager = FileManager(str(sample_output_dir), str(sample_output_dir), "flat")
+    downloader = Downloader(file_manager, max_workers=1, retries=1, timeout=10, max_downloads=None, username=None, password=None, verify_ssl=True)
+    output_path = sample_output_dir / "ScenarioMIP_100km_tas_Amon_CMCC-ESM2_ssp585_r1i1p1f1_gn_201501-210012.nc"
+    output_path.write_bytes(b"test_data")
+    file_info["size"] = len(b"test_data")
+    st = output_path.stat()
+    (sample_output_dir / (output_path.name + ".checksum")).write_text(f"{file_info['checksum'][0]} {st.st_size} {st.st_mtime_ns}")
+    # Rewritten at the same size after verification: the sidecar no longer vouches for it
+    output_path.write_bytes(b"corrupted")
+    os.utime(output_path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    with patch.object(downloader, "verify_checksum", return_value=True) as mock_verify:
+        path, failed_info = downloader.download_file(file_info)
+        mock_verify.assert_called_once()
+    assert path == str(output_path)
+    assert failed_info is None
+
+def test_downloader_download_file_existing_size_mismatch(sample_output_dir, file_info):
+    file_manager = FileManager(str(sample_output_dir), str(sample_output_dir), "flat")
+    downloader = Downloader(file_manager, max_workers=1, retries=1, timeout=10, max_downloads=None, username=None, password=None, verify_ssl=True)
+    output_path = sample_output_dir / "ScenarioMIP_100km_tas_Amon_CMCC-ESM2_ssp585_r1i1p1f1_gn_201501-210012.nc"
+    output_path.write_bytes(b"partial")
+    file_info["size"] = len(b"test_data")
+    with patch.object(downloader.session, "get") as mock_get:
+        mock_get.return_value = MagicMock(status_code=200, iter_content=lambda chunk_size: [b"test_data"])
+        path, failed_info = downloader.download_file(file_info)
+        mock_get.assert_called_once()
+    assert path == str(output_path)
+    assert output_path.read_bytes() == b"test_data"
+    st = output_path.stat()
+    assert (sample_output_dir / (output_path.name + ".checksum")).read_text().split() == [
+        file_info["checksum"][0], str(st.st_size), str(st.st_mtime_ns)
+    ]
+
 def test_downloader_download_file_network_error(sample_output_dir, file_info, stop_event, caplog):
     file_manager = FileManager(str(sample_output_dir), str(sample_output_dir), "flat")
     downloader = Downloader(file_manager, max_workers=1, retries=1, timeout=10, max_downloads=None, username=None, password=None, verify_ssl=True)
@@ -313,6 +466,22 @@ def test_downloader_download_file_retries(sample_output_dir, file_info, stop_eve
         assert mock_get.call_count == 2
         mock_sleep.assert_called_with(7)  # 2^1 + 5
 
+def test_downloader_download_file_tries_next_replica_before_sleeping(sample_output_dir, file_info):
+    file_manager = FileManager(str(sample_output_dir), str(sample_output_dir), "flat")
+    downloader = Downloader(file_manager, max_workers=1, retries=2, timeout=10, max_downloads=None, username=None, password=None, verify_ssl=True)
+    file_info["url"] = ["http://down.example.com/tas.nc|HTTPServer", "http://up.example.com/tas.nc|HTTPServer"]
+    output_path = sample_output_dir / "ScenarioMIP_100km_tas_Amon_CMCC-ESM2_ssp585_r1i1p1f1_gn_201501-210012.nc"
+    with patch.object(downloader.session, "get") as mock_get, patch("time.sleep") as mock_sleep:
+        mock_get.side_effect = [
+            requests.exceptions.RequestException("Failed"),
+            MagicMock(status_code=200, iter_content=lambda chunk_size: [b"test_data"])
+        ]
+        path, failed_info = downloader.download_file(file_info)
+        mock_sleep.assert_not_called()
+    assert path == str(output_path)
+    assert failed_info is None
+    assert downloader.host_failures == {"down.example.com": 1}
+
 def test_downloader_download_file_invalid_url(sample_output_dir, file_info, stop_event, caplog):
     file_manager = FileManager(str(sample_output_dir), str(sample_output_dir), "flat")
     downloader = Downloader(file_manager, max_workers=1, retries=1, timeout=10, max_downloads=None, username=None, password=None, verify_ssl=True)
@@ -457,6 +626,18 @@ def test_parse_file_time_range_valid():
     assert start_date == "2015-01-01"
     assert end_date == "2100-12-01"
 
+def test_parse_file_time_range_daily():
+    start_date, end_date = parse_file_time_range("tas_day_CMCC-ESM2_ssp585_r1i1p1f1_gn_20150101-20151231.nc")
+    assert start_date == "2015-01-01"
+    assert end_date == "2015-12-31"
+
+def test_parse_file_time_range_rejects_invalid_date_by_default():
+    assert parse_file_time_range("tas_Amon_CMCC-ESM2_ssp585_r1i1p1f1_gn_201513-210012.nc") == (None, None)
+    assert parse_file_time_range("tas_day_CMCC-ESM2_ssp585_r1i1p1f1_gn_20150132-20151231.nc") == (None, None)
+    assert parse_file_time_range("tas_day_CMCC-ESM2_ssp585_r1i1p1f1_gn_20150229-20151231.nc") == (None, None)
+    assert parse_file_time_range("tas_day_CMCC-ESM2_ssp585_r1i1p1f1_gn_20160229-20161231.nc") == ("2016-02-29", "2016-12-31")
+    assert parse_file_time_range("tas_Amon_CMCC-ESM2_ssp585_r1i1p1f1_gn_000001-000012.nc") == (None, None)
+
 def test_parse_file_time_range_invalid(caplog):
     filename = "tas_Amon_CMCC-ESM2_ssp585_r1i1p1f1_gn_invalid.nc"
     with caplog.at_level(logging.DEBUG):
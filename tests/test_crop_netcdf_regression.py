@@ -0,0 +1,116 @@
+import logging
+import numpy as np
+import netCDF4 as nc
+import pytest
+from unittest.mock import patch
+from gridflow import crop_netcdf
+from gridflow.crop_netcdf import crop_netcdf_file
+
+# Fixture to reset logging and the per-grid caches before each test
+@pytest.fixture(autouse=True)
+def reset_state():
+    logger = logging.getLogger()
+    logger.handlers = []
+    logger.setLevel(logging.NOTSET)
+    crop_netcdf._crop_window_cache.clear()
+    crop_netcdf._coord_var_cache.clear()
+    yield
+    logger.handlers = []
+
+def make_file(path, lat, lon, nt=3, chunksizes=None, packed=False):
+    """Write a small time x lat x lon file with a 'tas' field that is unique at every grid point."""
+    with nc.Dataset(path, 'w') as ds:
+        ds.createDimension('time', None)
+        ds.createDimension('lat', len(lat))
+        ds.createDimension('lon', len(lon))
+        ds.createVariable('time', 'f8', ('time',))[:] = np.arange(nt)
+        lat_var = ds.createVariable('lat', 'f8', ('lat',))
+        lat_var.units = 'degrees_north'
+        lat_var[:] = lat
+        lon_var = ds.createVariable('lon', 'f8', ('lon',))
+        lon_var.units = 'degrees_east'
+        lon_var[:] = lon
+        values = np.arange(nt * len(lat) * len(lon)).reshape(nt, len(lat), len(lon))
+        if packed:
+            tas = ds.createVariable('tas', 'i2', ('time', 'lat', 'lon'), zlib=True, chunksizes=chunksizes, fill_value=np.int16(-32767))
+            tas.scale_factor = 0.01
+            tas.add_offset = 250.0
+            tas.set_auto_maskandscale(False)
+            tas[:] = (values % 30000).astype('i2')
+        else:
+            tas = ds.createVariable('tas', 'f4', ('time', 'lat', 'lon'), zlib=chunksizes is not None, chunksizes=chunksizes, fill_value=1e20)
+            tas[:] = values.astype('f4')
+        tas.units = 'K'
+
+def read(path, name='tas'):
+    with nc.Dataset(path) as ds:
+        ds.set_auto_maskandscale(False)
+        return ds.variables[name][:]
+
+def test_crop_single_chunk_file_uses_direct_chunk_copy(tmp_path):
+    pytest.importorskip("h5py")
+    src, out = tmp_path / "in.nc", tmp_path / "out.nc"
+    lat, lon = np.arange(-9.0, 10.0, 2.0), np.arange(0.0, 40.0, 2.0)
+    # One chunk per time step covering the whole grid, so a full-grid crop is chunk-aligned
+    make_file(src, lat, lon, chunksizes=(1, len(lat), len(lon)))
+    with patch.object(crop_netcdf, 'copy_direct_chunks', wraps=crop_netcdf.copy_direct_chunks) as direct:
+        assert crop_netcdf_file(src, out, -10, 10, 0, 40)
+    direct.assert_called_once()
+    assert 'tas' in direct.call_args[0][2]
+    np.testing.assert_array_equal(read(out), read(src))
+    np.testing.assert_array_equal(read(out, 'lon'), lon)
+
+def test_crop_packed_int16_copies_raw_values(tmp_path):
+    src, out = tmp_path / "in.nc", tmp_path / "out.nc"
+    lat, lon = np.arange(-89.0, 90.0, 2.0), np.arange(-180.0, 180.0, 2.0)
+    make_file(src, lat, lon, chunksizes=(1, 45, 90), packed=True)
+    assert crop_netcdf_file(src, out, -20, 20, 10, 40)
+    lat_idx = np.where((lat >= -20) & (lat <= 20))[0]
+    lon_idx = np.where((lon >= 10) & (lon <= 40))[0]
+    raw = read(out)
+    assert raw.dtype == np.int16
+    np.testing.assert_array_equal(raw, read(src)[:, lat_idx][:, :, lon_idx])
+    with nc.Dataset(out) as ds:
+        tas = ds.variables['tas']
+        assert tas.scale_factor == pytest.approx(0.01)
+        assert tas.add_offset == pytest.approx(250.0)
+        assert tas._FillValue == -32767
+        assert tas.units == 'K'
+
+def test_crop_seam_crossing_box_keeps_only_window(tmp_path):
+    src, out = tmp_path / "in.nc", tmp_path / "out.nc"
+    lat, lon = np.arange(-88.75, 90.0, 2.5), np.arange(0.0, 360.0, 2.5)
+    make_file(src, lat, lon, chunksizes=(1, 36, 72))
+    assert crop_netcdf_file(src, out, -10, 10, -20, 20)
+    # 340..357.5 from the end of the axis followed by 0..20 from its start, not the whole 144-lon ring
+    tail, head = np.where(lon >= 340)[0], np.where(lon <= 20)[0]
+    out_lon = read(out, 'lon')
+    assert len(out_lon) == 17
+    np.testing.assert_array_equal(out_lon, np.concatenate([lon[tail], lon[head]]))
+    lat_idx = np.where((lat >= -10) & (lat <= 10))[0]
+    data = read(src)[:, lat_idx]
+    np.testing.assert_array_equal(read(out), np.concatenate([data[:, :, tail], data[:, :, head]], axis=2))
+
+def test_crop_bounding_box_negative_request_on_0_360_grid(tmp_path):
+    src, out = tmp_path / "in.nc", tmp_path / "out.nc"
+    lat, lon = np.arange(-89.0, 90.0, 2.0), np.arange(0.0, 360.0, 2.0)
+    make_file(src, lat, lon, chunksizes=(1, 45, 90))
+    assert crop_netcdf_file(src, out, 30, 50, -100, -80)
+    lat_idx = np.where((lat >= 30) & (lat <= 50))[0]
+    lon_idx = np.where((lon >= 260) & (lon <= 280))[0]
+    np.testing.assert_array_equal(read(out, 'lat'), lat[lat_idx])
+    np.testing.assert_array_equal(read(out, 'lon'), lon[lon_idx])
+    np.testing.assert_array_equal(read(out), read(src)[:, lat_idx][:, :, lon_idx])
+    assert not (tmp_path / "out.nc.part").exists()
+
+def test_crop_negative_longitude_box_with_buffer(tmp_path):
+    src, out = tmp_path / "in.nc", tmp_path / "out.nc"
+    lat, lon = np.arange(-89.0, 90.0, 2.0), np.arange(-180.0, 180.0, 2.0)
+    make_file(src, lat, lon)
+    # 500 km is ~4.5 degrees of latitude and ~4.66 degrees of longitude at 15N
+    assert crop_netcdf_file(src, out, 10, 20, -100, -90, buffer_km=500)
+    np.testing.assert_array_equal(read(out, 'lat'), np.arange(7.0, 24.0, 2.0))
+    np.testing.assert_array_equal(read(out, 'lon'), np.arange(-104.0, -85.0, 2.0))
+    lat_idx = np.where((lat >= 7) & (lat <= 23))[0]
+    lon_idx = np.where((lon >= -104) & (lon <= -86))[0]
+    np.testing.assert_array_equal(read(out), read(src)[:, lat_idx][:, :, lon_idx])
@@ -127,8 +127,8 @@ def test_query_handler_fetch_datasets_pagination():
     
     with patch.object(query_handler.session, "get") as mock_get:
         mock_get.side_effect = [
-            MagicMock(status_code=200, json=lambda: mock_responses[0]),
-            MagicMock(status_code=200, json=lambda: mock_responses[1])
+            MagicMock(status_code=200, content=json.dumps(mock_responses[0]).encode()),
+            MagicMock(status_code=200, content=json.dumps(mock_responses[1]).encode())
         ]
         files = query_handler.fetch_datasets(params, timeout=10)
         assert len(files) == 2
@@ -0,0 +1,202 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+import pytest
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch, MagicMock
+from gridflow import prism_downloader
+from gridflow.prism_downloader import Downloader, FileManager, check_data_availability, compute_sha256, download_prism, MAX_RETRY_DELAY
+
+# Fixture to reset logging before each test
+@pytest.fixture(autouse=True)
+def reset_logging():
+    logger = logging.getLogger()
+    logger.handlers = []
+    logger.setLevel(logging.NOTSET)
+    yield
+    logger.handlers = []
+
+class FakeResponse:
+    def __init__(self, status_code=200, body=b"", headers=None):
+        self.status_code = status_code
+        self.body = body
+        self.headers = headers if headers is not None else {"Content-Length": str(len(body))}
+
+    def iter_content(self, chunk_size=1):
+        yield self.body
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"HTTP {self.status_code}", response=self)
+
+    def close(self):
+        pass
+
+class FakeSession:
+    """Stands in for the Downloader's session: dates listed in *missing* answer HEAD with 404."""
+    def __init__(self, missing=()):
+        self.missing = set(missing)
+        self.lock = threading.Lock()
+        self.heads = []
+        self.downloads = []
+        self.events = []
+
+    def head(self, url, **kwargs):
+        with self.lock:
+            self.heads.append(url)
+            self.events.append("check")
+        time.sleep(0.002)
+        return FakeResponse(404 if url.rsplit("_", 1)[1][:-4] in self.missing else 200)
+
+    def get(self, url, **kwargs):
+        with self.lock:
+            self.downloads.append(url)
+            self.events.append("download")
+        time.sleep(0.002)
+        return FakeResponse(200, b"zipdata")
+
+def run(tmp_path, session, start="2020-01", end="2020-06", **kwargs):
+    with patch.object(prism_downloader, "make_session", return_value=session):
+        return download_prism("tmean", "4km", "monthly", start, end, output_dir=str(tmp_path / "out"),
+                              metadata_dir=str(tmp_path / "meta"), workers=2, **kwargs)
+
+class CountingExecutor(ThreadPoolExecutor):
+    """ThreadPoolExecutor that records the most futures of each task kind outstanding at once."""
+    peak = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._outstanding = {}
+        self._count_lock = threading.Lock()
+
+    def submit(self, fn, *args, **kwargs):
+        kind = getattr(fn, "__name__", str(fn))
+        with self._count_lock:
+            self._outstanding[kind] = self._outstanding.get(kind, 0) + 1
+            CountingExecutor.peak[kind] = max(CountingExecutor.peak.get(kind, 0), self._outstanding[kind])
+        future = super().submit(fn, *args, **kwargs)
+        future.add_done_callback(lambda _: self._release(kind))
+        return future
+
+    def _release(self, kind):
+        with self._count_lock:
+            self._outstanding[kind] -= 1
+
+def test_download_prism_bounds_in_flight_checks(tmp_path):
+    CountingExecutor.peak = {}
+    session = FakeSession()
+    with patch.object(prism_downloader, "ThreadPoolExecutor", CountingExecutor):
+        assert run(tmp_path, session, start="2019-01", end="2020-12")
+    assert len(session.heads) == 24
+    assert 0 < CountingExecutor.peak["check_data_availability"] <= 4
+    # Downloads start while availability checks are still running
+    events = session.events
+    assert events.index("download") < len(events) - 1 - events[::-1].index("check")
+
+def test_download_prism_progress_reaches_total_dates(tmp_path, caplog):
+    session = FakeSession(missing={"201903", "201907"})
+    with caplog.at_level(logging.INFO):
+        assert run(tmp_path, session, start="2019-01", end="2019-12")
+    # Unavailable dates count towards progress as well as downloaded ones
+    assert "Final Progress: 12/12 files" in caplog.text
+    assert len(session.downloads) == 10
+    assert "Completed: 10/10 files processed successfully" in caplog.text
+
+def test_download_prism_stop_during_checks_returns_false(tmp_path):
+    session = FakeSession()
+    assert run(tmp_path, session, start="2015-01", end="2020-12", stop_flag=lambda: True) is False
+    # Only the first window of checks was ever submitted
+    assert len(session.heads) <= 4
+
+def test_download_prism_reuses_cached_availability(tmp_path):
+    assert run(tmp_path, FakeSession())
+    for path in (tmp_path / "out").iterdir():
+        path.unlink()
+    session = FakeSession()
+    assert run(tmp_path, session)
+    # Every date was found available on the first run, so none needs a HEAD request
+    assert session.heads == []
+    assert len(session.downloads) == 6
+
+def test_download_prism_rechecks_expired_availability(tmp_path):
+    assert run(tmp_path, FakeSession())
+    cache_path = tmp_path / "meta" / "gridflow_prism_availability_cache.json"
+    cache = json.loads(cache_path.read_text())
+    cache["tmean/4km/monthly/202003"]["checked"] = time.time() - prism_downloader.AVAILABILITY_CACHE_TTL - 1
+    cache_path.write_text(json.dumps(cache))
+    session = FakeSession()
+    assert run(tmp_path, session)
+    assert [url.rsplit("_", 1)[1] for url in session.heads] == ["202003.zip"]
+    # The re-check refreshes the entry
+    assert json.loads(cache_path.read_text())["tmean/4km/monthly/202003"]["checked"] > cache["tmean/4km/monthly/202003"]["checked"]
+
+def test_download_prism_bounds_in_flight_downloads(tmp_path):
+    assert run(tmp_path, FakeSession(), start="2019-01", end="2020-12")
+    for path in (tmp_path / "out").iterdir():
+        path.unlink()
+    # Every date is cached now, so all 24 downloads are queued before the loop starts
+    CountingExecutor.peak = {}
+    session = FakeSession()
+    with patch.object(prism_downloader, "ThreadPoolExecutor", CountingExecutor):
+        assert run(tmp_path, session, start="2019-01", end="2020-12")
+    assert len(session.downloads) == 24
+    assert 0 < CountingExecutor.peak["download_file"] <= 4
+
+@pytest.mark.parametrize("status", [404, 410])
+def test_check_data_availability_missing_file_skips_get(status):
+    session = MagicMock()
+    session.head.return_value = FakeResponse(status)
+    assert check_data_availability("tmean", "4km", "monthly", 2020, "202001", session=session) is None
+    session.get.assert_not_called()
+
+def test_check_data_availability_other_status_falls_back_to_get():
+    session = MagicMock()
+    session.head.return_value = FakeResponse(405)
+    session.get.return_value = FakeResponse(200)
+    result = check_data_availability("tmean", "4km", "monthly", 2020, "202001", session=session)
+    assert result["filename"] == "prism_tmean_us_25m_202001.zip"
+    session.get.assert_called_once()
+
+def http_error(status, retry_after=None):
+    headers = {"Retry-After": retry_after} if retry_after is not None else {}
+    return requests.HTTPError(f"HTTP {status}", response=FakeResponse(status, headers=headers))
+
+@pytest.mark.parametrize("error, attempt, delay", [
+    (http_error(429, "7"), 1, 7),
+    (http_error(503, "7"), 3, 7),
+    (http_error(429, "600"), 1, MAX_RETRY_DELAY),
+    (http_error(429, "Wed, 21 Oct 2026 07:28:00 GMT"), 2, 1.0),
+    (http_error(500, "7"), 3, 2.0),
+    (requests.ConnectionError("reset"), 1, 0.5),
+    (requests.ConnectionError("reset"), 10, MAX_RETRY_DELAY),
+])
+def test_retry_delay(error, attempt, delay):
+    assert Downloader._retry_delay(error, attempt) == delay
+
+def test_download_file_honors_retry_after(tmp_path):
+    file_manager = FileManager(str(tmp_path / "out"), str(tmp_path / "meta"))
+    downloader = Downloader(file_manager, retries=3, timeout=10, workers=1)
+    downloader.session = MagicMock()
+    downloader.session.get.side_effect = [FakeResponse(429, headers={"Retry-After": "4"}), FakeResponse(200, b"zipdata")]
+    output_path = tmp_path / "out" / "prism_tmean_us_25m_202001.zip"
+    with patch.object(prism_downloader.time, "sleep") as sleep:
+        assert downloader.download_file({"url": "https://example.com/a.zip", "output_path": output_path}) == str(output_path)
+    sleep.assert_called_once_with(4)
+    assert output_path.read_bytes() == b"zipdata"
+
+def test_check_data_availability_without_session_uses_requests():
+    with patch.object(prism_downloader.requests, "head", return_value=FakeResponse(200)) as head:
+        result = check_data_availability("ppt", "800m", "daily", 2020, "20200101")
+    assert result["url"].endswith("/800m/ppt/daily/2020/prism_ppt_us_30s_20200101.zip")
+    head.assert_called_once()
+
+def test_compute_sha256(tmp_path):
+    path = tmp_path / "prism.zip"
+    data = bytes(range(256)) * 5000  # More than one CHUNK_SIZE read on the fallback path
+    path.write_bytes(data)
+    assert compute_sha256(path) == hashlib.sha256(data).hexdigest()
+    with patch.object(prism_downloader, "hashlib", MagicMock(wraps=hashlib, spec=["sha256"])):
+        assert compute_sha256(path) == hashlib.sha256(data).hexdigest()